@@ -34,6 +34,8 @@ The delivery orders can be grouped in one files
 or be exported each one in a separate file.
 The files can be generated automatically
 on the shipment of a Delivery Order or from a manual action.
+The automatic export is done by a scheduled action which exports
+the processed Delivery Orders in batch.
 They are exported to a defined path or
 in a document directory of your choice if the "document" module is installed.
 
@@ -53,14 +55,18 @@ Sub-modules already exist to generate file according to specs of :
     'depends': ['base',
                 'stock',
                 'delivery'],
-    'data': ['carrier_file_view.xml',
+    'data': ['carrier_file_data.xml',
+             'carrier_file_view.xml',
              'stock_view.xml',
              'wizard/generate_carrier_files_view.xml',
              'security/ir.model.access.csv'],
     'demo': ['carrier_file_demo.xml',
              'carrier_file_demo.yml'],
     'test': ['test/carrier_file.yml',
-             'test/carrier_file_manual.yml'],
+             'test/carrier_file_manual.yml',
+             'test/carrier_file_filename.yml',
+             'test/carrier_file_archive.yml',
+             'test/carrier_file_format.yml'],
     'images': [],
     'installable': False,
     'auto_install': False,
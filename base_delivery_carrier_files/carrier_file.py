@@ -20,12 +20,30 @@
 ##############################################################################
 
 import os
+import errno
+import codecs
 import logging
+import time
+import uuid
+import tarfile
+import zipfile
+import datetime
+import tempfile
+from contextlib import contextmanager
 
 from openerp.osv import orm, fields
-from .generator import new_file_generator
+from openerp import SUPERUSER_ID
+from .generator import (new_file_generator,
+                        generator_registry,
+                        StreamedFileContent,
+                        RowSource,
+                        EMPTY_ROW_SOURCE)
+from openerp.tools import ustr
 from tools.translate import _
 
+# buffer used to write the files on the disk
+WRITE_BUFFER_SIZE = 1024 * 1024
+
 
 class CarrierFile(orm.Model):
     _name = 'delivery.carrier.file'
@@ -40,7 +58,22 @@ class CarrierFile(orm.Model):
         """
         Selection can be inherited to add more write modes
         """
-        return [('disk', 'Disk')]
+        return [('disk', 'Disk'),
+                ('archive', 'Archive on Disk')]
+
+    def get_archive_format_selection(self, cr, uid, context=None):
+        """
+        Selection can be inherited to add more archive formats
+        """
+        return [('zip', 'Zip'),
+                ('tar.gz', 'Tar Gzip')]
+
+    def get_file_format_selection(self, cr, uid, context=None):
+        """
+        Selection can be inherited to add more record formats
+        """
+        return [('csv', 'CSV'),
+                ('fixed_width', 'Fixed width')]
 
     _columns = {
         'name': fields.char('Name', size=64, required=True),
@@ -48,21 +81,119 @@ class CarrierFile(orm.Model):
         'group_pickings': fields.boolean('Group all pickings in one file',
                                          help='All the pickings will be '
                                               'grouped in the same file. '
-                                              'Has no effect when the files '
-                                              'are automatically exported at '
-                                              'the delivery order process.'),
+                                              'When the files are '
+                                              'automatically exported, the '
+                                              'pickings processed since the '
+                                              'last export are grouped.'),
         'write_mode': fields.selection(get_write_mode_selection,
                                        'Write on',
                                        required=True),
         'export_path': fields.char('Export Path', size=256),
+        'export_subfolder': fields.char(
+            'Export Subfolder', size=64,
+            help='Optional subfolder of the export path where the files '
+                 'are written, with the date of the export formatted '
+                 'with strftime, i.e. %Y/%m/%d to have one folder '
+                 'per day.'),
+        'archive_format': fields.selection(
+            get_archive_format_selection,
+            'Archive Format',
+            help='All the files generated at once are written in one '
+                 'archive of this format.'),
+        'disk_fsync': fields.boolean(
+            'Sync Files to Disk',
+            help='Wait until the files are physically written on the '
+                 'disk before they are made visible in the export path. '
+                 'Safer in case of crash but slower.'),
         'auto_export': fields.boolean('Export at delivery order process',
                                       help='The file will be automatically '
-                                           'generated when a delivery order '
-                                           'is processed. If activated, each '
-                                           'delivery order will be exported '
-                                           'in a separate file.'),
+                                           'generated after a delivery '
+                                           'order is processed, by the '
+                                           'scheduled action "Export '
+                                           'pending carrier files".'),
+        'file_format': fields.selection(get_file_format_selection,
+                                        'File Format',
+                                        required=True,
+                                        help='Fixed width records are '
+                                             'only available for the '
+                                             'carriers which define the '
+                                             'width of their columns.'),
+        'encoding': fields.char('Encoding', size=32, required=True,
+                                help='Encoding of the file, i.e. utf-8, '
+                                     'cp1252, latin-1'),
+        'encoding_errors': fields.selection(
+            [('strict', 'Fail'),
+             ('replace', 'Replace by ?'),
+             ('ignore', 'Skip the character')],
+            'Unencodable Characters',
+            required=True,
+            help='What to do with the characters which cannot be '
+                 'represented in the encoding of the file.'),
+        'csv_delimiter': fields.char('CSV Delimiter', size=1,
+                                     help='Leave empty to use the '
+                                          'delimiter of the carrier.'),
+    }
+
+    _defaults = {
+        'file_format': 'csv',
+        'encoding': 'utf-8',
+        'encoding_errors': 'strict',
+        'archive_format': 'zip',
     }
 
+    def _register_hook(self, cr):
+        """ Check that every type of carrier file has a generator """
+        super(CarrierFile, self)._register_hook(cr)
+        log = logging.getLogger('delivery.carrier.file')
+        for carrier_type, __ in self.get_type_selection(cr, SUPERUSER_ID):
+            if carrier_type not in generator_registry:
+                log.warning("No generator is registered for the "
+                            "carrier file type '%s'", carrier_type)
+
+    def _check_encoding(self, cr, uid, ids, context=None):
+        for carrier_file in self.browse(cr, uid, ids, context=context):
+            try:
+                codecs.lookup(carrier_file.encoding)
+            except LookupError:
+                return False
+        return True
+
+    def _check_file_format(self, cr, uid, ids, context=None):
+        for carrier_file in self.browse(cr, uid, ids, context=context):
+            if carrier_file.file_format != 'fixed_width':
+                continue
+            try:
+                file_generator = new_file_generator(carrier_file.type)
+            except ValueError:
+                # no generator for this type
+                return False
+            line_class = file_generator.line_class
+            if line_class is None or not all(line_class._widths):
+                return False
+        return True
+
+    def _check_csv_delimiter(self, cr, uid, ids, context=None):
+        for carrier_file in self.browse(cr, uid, ids, context=context):
+            if not carrier_file.csv_delimiter:
+                continue
+            # the csv module only accepts str delimiters
+            try:
+                carrier_file.csv_delimiter.encode('ascii')
+            except UnicodeError:
+                return False
+        return True
+
+    _constraints = [
+        (_check_encoding, 'Unknown encoding.', ['encoding']),
+        (_check_csv_delimiter,
+         'The CSV delimiter must be an ASCII character.',
+         ['csv_delimiter']),
+        (_check_file_format,
+         'This carrier does not define the width of all its columns, '
+         'its file cannot be written with fixed width records.',
+         ['file_format', 'type']),
+    ]
+
     def _write_file(self, cr, uid, carrier_file, filename, file_content,
                     context=None):
         """
@@ -72,18 +203,326 @@ class CarrierFile(orm.Model):
         :param browse_record carrier_file: browsable carrier.file
                                            (configuration)
         :param tuple filename: name of the file to write
-        :param tuple file_content: content of the file to write
+        :param file_content: content of the file to write, either a
+                             string or a StreamedFileContent which
+                             writes its rows directly in the file
+        :return: True if write is successful
+        """
+        with self._open_export_file(cr, uid, carrier_file, filename,
+                                    context=context) as file_handle:
+            self._write_content(file_handle, file_content)
+        return True
+
+    def _write_picking_file(self, cr, uid, carrier_file, filename,
+                            file_content, picking_ids, context=None):
+        """
+        Write a file generated for pickings, called by _write_files.
+        By default, it writes the file with _write_file. Inherit when
+        the pickings of the file are needed to write it.
+
+        :param list picking_ids: ids of the pickings in the file
         :return: True if write is successful
         """
+        return self._write_file(cr, uid, carrier_file, filename,
+                                file_content, context=context)
+
+    @contextmanager
+    def _open_export_file(self, cr, uid, carrier_file, filename,
+                          context=None):
+        """
+        Open a file in the export directory for writing.
+
+        The file is written under a temporary hidden name in the same
+        directory then renamed when it is complete, so the carrier
+        scripts polling the directory never see a file partially
+        written. It is removed when an error happens.
+        An existing file is never replaced, see _publish_file.
+
+        :param browse_record carrier_file: browsable carrier.file
+                                           (configuration)
+        :param str filename: final name of the file
+        :return: context manager giving the opened file
+        """
         if not carrier_file.export_path:
             raise orm.except_orm(_('Error'),
                                  _('Export path is not defined '
                                    'for carrier file %s') %
                                  (carrier_file.name,))
-        full_path = os.path.join(carrier_file.export_path, filename)
-        with open(full_path, 'w') as file_handle:
+        export_dir = self._get_export_directory(cr, uid, carrier_file,
+                                                context=context)
+        if not os.path.isdir(export_dir):
+            os.makedirs(export_dir)
+        full_path = os.path.join(export_dir, filename)
+        tmp_path = os.path.join(export_dir, '.%s.%s.tmp' %
+                                (filename, uuid.uuid4().hex))
+        # same permissions as a file created by open()
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with os.fdopen(fd, 'w', WRITE_BUFFER_SIZE) as file_handle:
+                yield file_handle
+                if carrier_file.disk_fsync:
+                    file_handle.flush()
+                    os.fsync(file_handle.fileno())
+            self._publish_file(tmp_path, full_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if carrier_file.disk_fsync:
+            self._fsync_directory(export_dir)
+
+    @staticmethod
+    def _publish_file(tmp_path, full_path):
+        """
+        Give its final name to a temporary file without replacing an
+        existing file. When the name is already taken, by an export of
+        another process for instance, a counter is appended to the name
+        before its extension: out_20120214_094435_1.csv
+
+        The file is hard linked to its final name, which fails
+        atomically when the name exists. On the file systems without
+        hard links, it is renamed after a check of the name.
+
+        :param str tmp_path: path of the temporary file
+        :param str full_path: path wanted for the file
+        :return: the final path of the file
+        """
+        root, extension = os.path.splitext(full_path)
+        path = full_path
+        counter = 0
+        use_link = hasattr(os, 'link')
+        while True:
+            if use_link:
+                try:
+                    os.link(tmp_path, path)
+                except OSError as err:
+                    if err.errno == errno.EEXIST:
+                        counter += 1
+                        path = '%s_%d%s' % (root, counter, extension)
+                        continue
+                    if err.errno not in (errno.EPERM, errno.EOPNOTSUPP):
+                        raise
+                    use_link = False
+                    continue
+                os.remove(tmp_path)
+                return path
+            if os.path.exists(path):
+                counter += 1
+                path = '%s_%d%s' % (root, counter, extension)
+                continue
+            os.rename(tmp_path, path)
+            return path
+
+    def _get_archive_filename(self, cr, uid, carrier_file, context=None):
+        """
+        Returns the name of the archive containing the files of
+        a generation.
+
+        :param browse_record carrier_file: browsable carrier.file
+                                           (configuration)
+        :return: name of the archive
+        """
+        file_generator = new_file_generator(carrier_file.type)
+        filename = "%s_%s.%s" % (carrier_file.name,
+                                 file_generator._filename_date(),
+                                 carrier_file.archive_format or 'zip')
+        return file_generator.sanitize_filename(filename)
+
+    def _add_archive_entry(self, archive, archive_format, filename,
+                           file_content):
+        """
+        Add a file in an opened archive. The streamed contents are
+        rendered in a temporary file, not in memory.
+
+        :param archive: opened ZipFile or TarFile
+        :param str archive_format: format of the archive
+        :param str filename: name of the file in the archive
+        :param file_content: string or StreamedFileContent
+        """
+        if archive_format == 'zip':
+            if isinstance(file_content, StreamedFileContent):
+                with tempfile.NamedTemporaryFile() as tmp_file:
+                    file_content.write_to(tmp_file)
+                    tmp_file.flush()
+                    archive.write(tmp_file.name, arcname=filename)
+            else:
+                archive.writestr(filename, file_content)
+        elif archive_format == 'tar.gz':
+            with tempfile.TemporaryFile() as tmp_file:
+                self._write_content(tmp_file, file_content)
+                entry = tarfile.TarInfo(filename)
+                entry.size = tmp_file.tell()
+                entry.mtime = time.time()
+                tmp_file.seek(0)
+                archive.addfile(entry, tmp_file)
+        else:
+            raise ValueError("Unknown archive format %s" % archive_format)
+
+    def _write_archive(self, cr, uid, carrier_file, files, context=None):
+        """
+        Write all the files in one archive on the disk, named with
+        their usual names inside the archive.
+
+        A file which cannot be generated is left out of the archive
+        and reported as failed. When the archive itself cannot be
+        written, all the files are failed.
+
+        :param browse_record carrier_file: browsable carrier file
+                                           configuration
+        :param list files: files as returned by the generator
+        :return: report of the generation, see _write_files
+        """
+        log = logging.getLogger('delivery.carrier.file')
+        generated_picking_ids = []
+        failed = []
+        if not files:
+            return {'generated_picking_ids': generated_picking_ids,
+                    'failed': failed,
+                    }
+        archive_format = carrier_file.archive_format or 'zip'
+        archive_name = self._get_archive_filename(cr, uid, carrier_file,
+                                                  context=context)
+        try:
+            with self._open_export_file(cr, uid, carrier_file,
+                                        archive_name,
+                                        context=context) as archive_handle:
+                if archive_format == 'zip':
+                    # zip64 allows more than 65535 entries and
+                    # archives bigger than 2 GiB
+                    archive = zipfile.ZipFile(archive_handle, 'w',
+                                              zipfile.ZIP_DEFLATED,
+                                              allowZip64=True)
+                else:
+                    archive = tarfile.open(fileobj=archive_handle,
+                                           mode='w:gz')
+                try:
+                    for filename, file_content, picking_ids in files:
+                        try:
+                            self._add_archive_entry(archive, archive_format,
+                                                    filename, file_content)
+                        except Exception as e:
+                            log.exception("Could not add the picking file "
+                                          "for pickings %s in the "
+                                          "archive %s: %s",
+                                          picking_ids, archive_name, e)
+                            failed.append((filename, picking_ids, ustr(e)))
+                            continue
+                        generated_picking_ids.extend(picking_ids)
+                finally:
+                    archive.close()
+        except Exception as e:
+            log.exception("Could not create the archive %s: %s",
+                          archive_name, e)
+            failed = [(filename, picking_ids, ustr(e))
+                      for filename, __, picking_ids in files]
+            generated_picking_ids = []
+        return {'generated_picking_ids': generated_picking_ids,
+                'failed': failed,
+                }
+
+    def _get_export_directory(self, cr, uid, carrier_file, context=None):
+        """
+        Returns the directory where the files are written on the disk:
+        the export path, or its subfolder when one is configured
+
+        :param browse_record carrier_file: browsable carrier.file
+                                           (configuration)
+        :return: path of the directory
+        """
+        export_dir = carrier_file.export_path
+        if carrier_file.export_subfolder:
+            today = datetime.datetime.now()
+            subfolder = today.strftime(carrier_file.export_subfolder)
+            export_dir = os.path.join(export_dir, subfolder)
+        return export_dir
+
+    @staticmethod
+    def _fsync_directory(path):
+        """ Sync a directory so the renaming of its files is durable """
+        try:
+            dir_fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            # not supported on this platform
+            return
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    @staticmethod
+    def _write_content(file_handle, file_content):
+        """
+        Write the content of a carrier file in an opened file
+
+        :param file file_handle: file to write in
+        :param file_content: string or StreamedFileContent
+        """
+        if isinstance(file_content, StreamedFileContent):
+            file_content.write_to(file_handle)
+        else:
             file_handle.write(file_content)
-        return True
+        return file_handle
+
+    def _read_row_sources(self, cr, uid, model, ids, fields_spec,
+                          context=None):
+        """
+        Read the fields of fields_spec on all the records at once
+        and follow the many2one fields recursively, with one read
+        per model in the specification whatever the number of records.
+
+        :param str model: name of the model of the records
+        :param list ids: ids of the records to read
+        :param dict fields_spec: {field: None} for plain fields,
+                                 {field: {sub-field: ...}} for many2one
+        :return: dict {id: RowSource}
+        """
+        if not ids:
+            return {}
+        model_obj = self.pool[model]
+        records = model_obj.read(cr, uid, list(ids), list(fields_spec),
+                                 context=context, load='_classic_write')
+        related = {}
+        for field, sub_spec in fields_spec.iteritems():
+            if sub_spec is None:
+                continue
+            column = model_obj._all_columns[field].column
+            assert column._type == 'many2one', \
+                "Only many2one fields can be followed, not %s" % field
+            related_ids = set(record[field] for record in records
+                              if record[field])
+            related[field] = self._read_row_sources(
+                cr, uid, column._obj, related_ids, sub_spec,
+                context=context)
+        sources = {}
+        for record in records:
+            values = {}
+            for field, sub_spec in fields_spec.iteritems():
+                value = record[field]
+                if sub_spec is not None:
+                    value = related[field].get(value, EMPTY_ROW_SOURCE)
+                values[field] = value
+            sources[record['id']] = RowSource(record['id'], values)
+        return sources
+
+    def _get_pickings(self, cr, uid, file_generator, picking_ids,
+                      context=None):
+        """
+        Returns the pickings given to the generator: RowSource read in
+        bulk when the generator declares its picking_fields, browse
+        records otherwise.
+
+        :return: list of pickings, in the order of picking_ids
+        """
+        if file_generator.picking_fields is None:
+            picking_obj = self.pool.get('stock.picking')
+            return [picking for picking in
+                    picking_obj.browse(cr, uid, picking_ids,
+                                       context=context)]
+        sources = self._read_row_sources(cr, uid, 'stock.picking',
+                                         picking_ids,
+                                         file_generator.picking_fields,
+                                         context=context)
+        return [sources[picking_id] for picking_id in picking_ids]
 
     def _generate_files(self, cr, uid, carrier_file, picking_ids,
                         context=None):
@@ -95,38 +534,76 @@ class CarrierFile(orm.Model):
                                            configuration
         :param list picking_ids: list of ids of pickings for which
                                  we have to generate a file
-        :return: True if successful
+        :return: report of the generation, see _write_files
         """
         if context is None:
             context = {}
         picking_obj = self.pool.get('stock.picking')
-        log = logging.getLogger('delivery.carrier.file')
         file_generator = new_file_generator(carrier_file.type)
-        pickings = [picking for picking in
-                    picking_obj.browse(cr, uid, picking_ids, context=context)]
+        pickings = self._get_pickings(cr, uid, file_generator, picking_ids,
+                                      context=context)
         # must return a list of generated pickings ids to update
-        files = file_generator.generate_files(pickings, carrier_file)
-        if carrier_file.auto_export:
-            context['picking_id'] = pickings and pickings[0].id
-        for f in files:
-            filename, file_content, picking_ids = f
-            # we pass the errors because the files can still be
-            # generated manually
-            # at first I would like to open a new cursor and
-            # commit the write after each file created
-            # but I encountered lock because the picking
-            # was already modified in the current transaction
+        # the files are streamed to their destination when they are
+        # written, so a picking which cannot be rendered only fails
+        # its own file
+        files = file_generator.generate_files(pickings, carrier_file,
+                                              stream=True)
+        report = self._write_files(cr, uid, carrier_file, files,
+                                   context=context)
+        # flag all the pickings at once, only when their file
+        # has been written
+        if report['generated_picking_ids']:
+            picking_obj.write(cr, uid, report['generated_picking_ids'],
+                              {'carrier_file_generated': True},
+                              context=context)
+        return report
+
+    def _write_files(self, cr, uid, carrier_file, files, context=None):
+        """
+        Write the files, each one in its own savepoint, so a file which
+        cannot be rendered or written rollbacks its own changes
+        (i.e. attachment) without preventing the other files to be
+        written. The streamed contents are rendered when they are
+        written, inside the savepoint.
+
+        We pass the errors because the files can still be generated
+        manually. We cannot commit after each file in a new cursor,
+        the pickings are already modified in the current transaction
+        and would be locked.
+
+        :param browse_record carrier_file: browsable carrier file
+                                           configuration
+        :param list files: files as returned by the generator
+        :return: dict with the report of the generation:
+                 {'generated_picking_ids': [ids of the pickings
+                                            written in a file],
+                  'failed': [(filename, [picking ids], error message)]}
+        """
+        if carrier_file.write_mode == 'archive':
+            return self._write_archive(cr, uid, carrier_file, files,
+                                       context=context)
+        log = logging.getLogger('delivery.carrier.file')
+        generated_picking_ids = []
+        failed = []
+        for filename, file_content, picking_ids in files:
+            cr.execute('SAVEPOINT carrier_file_write')
             try:
-                if self._write_file(cr, uid, carrier_file, filename,
-                                    file_content, context=context):
-                    picking_obj.write(cr, uid, picking_ids,
-                                      {'carrier_file_generated': True},
-                                      context=context)
+                written = self._write_picking_file(
+                    cr, uid, carrier_file, filename, file_content,
+                    picking_ids, context=context)
             except Exception as e:
+                cr.execute('ROLLBACK TO SAVEPOINT carrier_file_write')
                 log.exception("Could not create the picking file "
                               "for pickings %s: %s",
                               picking_ids, e)
-        return True
+                failed.append((filename, picking_ids, ustr(e)))
+                continue
+            cr.execute('RELEASE SAVEPOINT carrier_file_write')
+            if written:
+                generated_picking_ids.extend(picking_ids)
+        return {'generated_picking_ids': generated_picking_ids,
+                'failed': failed,
+                }
 
     def generate_files(self, cr, uid, carrier_file_id, picking_ids,
                        context=None):
@@ -139,7 +616,7 @@ class CarrierFile(orm.Model):
         :param int carrier_file_id: id of the carrier file configuration
         :param list picking_ids: list of ids of pickings for
                                  which we have to generate a file
-        :return: True if successful
+        :return: report of the generation, see _write_files
         """
         if not isinstance(carrier_file_id, (int, long)):
             if len(carrier_file_id) > 1:
@@ -1,6 +1,7 @@
 # CSV writer from python doc
 import csv
 import codecs
+import string
 
 try:
     import cStringIO as StringIO
@@ -8,34 +9,79 @@ except ImportError:
     import StringIO
 
 
+def _is_ascii_compatible(encoding):
+    """ Return True when the ASCII characters are encoded as themselves
+
+    The csv module can then directly write values already encoded
+    in this encoding (utf-8, latin-1, cp1252, ...) but not in
+    encodings such as utf-16.
+    """
+    ascii_chars = string.printable
+    return ascii_chars.decode('ascii').encode(encoding) == ascii_chars
+
+
 class UnicodeWriter(object):
 
     """
     A CSV writer which will write rows to CSV file "f",
     which is encoded in the given encoding.
+
+    Each value is encoded only once: directly in the target
+    encoding when it is ASCII compatible, in UTF-8 otherwise,
+    the buffer being re-encoded at once when it is flushed.
+
+    The rows are written in a buffer which is flushed to the file
+    every ``buffer_rows`` rows in ``writerows`` and after each
+    call to ``writerow``.
     """
 
-    def __init__(self, f, dialect=csv.excel, encoding="utf-8", **kwds):
-        # Redirect output to a queue
+    def __init__(self, f, dialect=csv.excel, encoding="utf-8",
+                 errors='strict', buffer_rows=1000, **kwds):
+        self.stream = f
+        self.errors = errors
+        self.buffer_rows = buffer_rows
+        if _is_ascii_compatible(encoding):
+            self.cell_encoding = encoding
+            self.encoder = None
+        else:
+            self.cell_encoding = 'utf-8'
+            self.encoder = codecs.getincrementalencoder(encoding)(errors)
         self.queue = StringIO.StringIO()
         self.writer = csv.writer(self.queue, dialect=dialect, **kwds)
-        self.stream = f
-        self.encoder = codecs.getincrementalencoder(encoding)()
 
-    def writerow(self, row):
+    def _encode_row(self, row):
+        encoding = self.cell_encoding
+        errors = self.errors
         # we ensure that we do not try to encode none or bool
-        row = [x or u'' for x in row]
-        self.writer.writerow([s.encode("utf-8") for s in row])
-        # Fetch UTF-8 output from the queue ...
+        return [(value if isinstance(value, unicode) else unicode(value))
+                .encode(encoding, errors) if value else ''
+                for value in row]
+
+    def flush(self):
+        """ Write the buffered rows to the target stream """
         data = self.queue.getvalue()
-        data = data.decode("utf-8")
-        # ... and reencode it into the target encoding
-        data = self.encoder.encode(data)
-        # write to the target stream
+        if not data:
+            return
+        if self.encoder is not None:
+            data = self.encoder.encode(data.decode('utf-8'))
         self.stream.write(data)
         # empty queue
+        self.queue.seek(0)
         self.queue.truncate(0)
 
+    def writerow(self, row):
+        self.writer.writerow(self._encode_row(row))
+        self.flush()
+
     def writerows(self, rows):
+        writerow = self.writer.writerow
+        encode_row = self._encode_row
+        buffer_rows = self.buffer_rows
+        count = 0
         for row in rows:
-            self.writerow(row)
+            writerow(encode_row(row))
+            count += 1
+            if count >= buffer_rows:
+                self.flush()
+                count = 0
+        self.flush()
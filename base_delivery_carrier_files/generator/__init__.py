@@ -21,5 +21,10 @@
 
 from .base_line import BaseLine
 from .file_generator import new_file_generator
+from .file_generator import generator_registry
 from .file_generator import CarrierFileGenerator
+from .file_generator import StreamedFileContent
+from .record_formatter import new_record_formatter
+from .record_formatter import RecordFormatter
+from .row_source import RowSource, EMPTY_ROW_SOURCE
 from . import generic_generator
@@ -19,6 +19,46 @@
 #
 ##############################################################################
 
+from itertools import izip
+from operator import attrgetter
+
+
+class BaseLineLayout(type):
+
+    """
+    Metaclass of the lines which compiles the "fields" class
+    attribute once, when the class is defined, so the instances
+    do not have to interpret the definition of the fields for
+    each row.
+
+    The compiled layout is stored on the class:
+
+    * _layout: tuple of (field name, max width) for each column
+    * _defaults: initial values of the instance attributes
+    * _get_values: callable returning the values of all the columns
+                   of a line, empty columns included
+    * _widths: max width of each column (False when unlimited)
+    """
+
+    def __init__(cls, name, bases, attrs):
+        super(BaseLineLayout, cls).__init__(name, bases, attrs)
+        layout = tuple(cls._field_definition(field) for field in cls.fields)
+        cls._layout = layout
+        cls._defaults = dict((field_name, '') for field_name, __ in layout
+                             if field_name)
+        # empty columns read an attribute which is always empty
+        names = [field_name or '_empty_column'
+                 for field_name, __ in layout]
+        if len(names) == 1:
+            single_getter = attrgetter(names[0])
+            cls._get_values = staticmethod(
+                lambda line: (single_getter(line),))
+        elif names:
+            cls._get_values = staticmethod(attrgetter(*names))
+        else:
+            cls._get_values = staticmethod(lambda line: ())
+        cls._widths = tuple(width for __, width in layout)
+
 
 class BaseLine(object):
 
@@ -70,8 +110,12 @@ class BaseLine(object):
     row.get_fields()
     => ['x', 'long']
     """
+    __metaclass__ = BaseLineLayout
+
     fields = ()
 
+    _empty_column = ''
+
     def __init__(self):
         """
         Create an instance attribute for each field
@@ -81,11 +125,7 @@ class BaseLine(object):
         """
         if not self.fields:
             raise ValueError("Fields Missing")
-        for field in self.fields:
-            field_name, _ = self._field_definition(field)
-            if not field_name:
-                continue
-            setattr(self, field_name, '')
+        self.__dict__.update(self._defaults)
 
     @staticmethod
     def _field_definition(field):
@@ -119,19 +159,15 @@ class BaseLine(object):
                  order of the class attribute "fields"
         """
         res = []
-        for field in self.fields:
-            field_name, width = self._field_definition(field)
-            if field_name:
-                value = getattr(self, field_name)
-                if value in (False, None):
-                    value = ''
-                elif not isinstance(value, (str, unicode)):
-                    value = unicode(value)
-                if width:
-                    value = value[0:width]
-            else:
+        append = res.append
+        for value, width in izip(self._get_values(self), self._widths):
+            if value in (False, None):
                 value = ''
-            res.append(value)
+            elif not isinstance(value, basestring):
+                value = unicode(value)
+            if width:
+                value = value[0:width]
+            append(value)
         return res
 
     def get_header(self):
@@ -141,8 +177,4 @@ class BaseLine(object):
 
         :return: a list of field names
         """
-        res = []
-        for field in self.fields:
-            field_name, _ = self._field_definition(field)
-            res.append(field_name)
-        return res
+        return [field_name for field_name, __ in self._layout]
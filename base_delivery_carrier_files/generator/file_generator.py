@@ -21,25 +21,204 @@
 
 import string
 import datetime
+import threading
 try:
     import cStringIO as StringIO
 except ImportError:
     import StringIO
 
+from .record_formatter import new_record_formatter
+
+
+class StreamedFileContent(object):
+    """
+    Content of a carrier file which is rendered only when it is
+    written to its destination.
+
+    The rows are consumed from an iterator and written one after the
+    other in the file handle, so the whole content of the file is
+    never held in memory.
+    The content can be written only once.
+    """
+
+    def __init__(self, generator, rows, configuration):
+        """
+        :param CarrierFileGenerator generator: generator which writes
+                                               the rows
+        :param iterator rows: rows to write in the file
+        :param browse_record configuration: configuration of
+                                            the file to generate
+        """
+        self.generator = generator
+        self.rows = rows
+        self.configuration = configuration
+
+    def write_to(self, file_handle):
+        """
+        Write the rows in the file handle
+
+        :param file file_handle: opened file to write in
+        """
+        self.generator._write_rows(file_handle, self.rows,
+                                   self.configuration)
+        return file_handle
+
+
+# characters removed from the filenames, precomputed for str.translate
+VALID_FILENAME_CHARS = "-_.() %s%s" % (string.ascii_letters, string.digits)
+_INVALID_FILENAME_CHARS = ''.join(chr(i) for i in xrange(256)
+                                  if chr(i) not in VALID_FILENAME_CHARS)
+
+
+class FilenameClock(object):
+
+    """
+    Give the dates to put in the filenames, unique in the process.
+
+    The dates have a resolution of one second, as expected by the
+    carriers, and a sequence is appended to the date when several
+    dates are asked in the same second:
+    20120214_094435, 20120214_094435_0001, 20120214_094435_0002, ...
+    When the system clock goes back, the last second is kept and its
+    sequence continues, so a date is never given twice.
+    """
+
+    def __init__(self, now=datetime.datetime.now):
+        self._now = now
+        self._lock = threading.Lock()
+        self._second = None
+        self._formatted = None
+        self._sequence = 0
+
+    def next_date(self):
+        """ Return a new unique date as str """
+        second = self._now().replace(microsecond=0)
+        with self._lock:
+            if self._second is not None and second <= self._second:
+                self._sequence += 1
+                return '%s_%04d' % (self._formatted, self._sequence)
+            self._second = second
+            self._formatted = second.strftime('%Y%m%d_%H%M%S')
+            self._sequence = 0
+            return self._formatted
+
+
+filename_clock = FilenameClock()
+
+
+class GeneratorRegistry(object):
+
+    """
+    Registry of the carrier file generators by carrier file type.
+
+    The generators declaring a ``carrier_type`` are registered when
+    their class is defined. A subclass declaring the same type
+    replaces its parent.
+    The generators only implementing ``carrier_for`` are looked up
+    once in the subclasses, then kept in the registry.
+
+    One instance of generator is kept for each carrier file type.
+    """
+
+    def __init__(self):
+        self._classes = {}
+        self._instances = {}
+
+    def register(self, generator_class):
+        carrier_type = generator_class.carrier_type
+        self._classes[carrier_type] = generator_class
+        self._instances.pop(carrier_type, None)
+
+    def _find_class(self, carrier_name):
+        """ Look for a generator which does not declare its carrier type
+
+        The most derived matching class is returned.
+        """
+        found = None
+        stack = list(CarrierFileGenerator.__subclasses__())
+        while stack:
+            cls = stack.pop(0)
+            if cls.carrier_for(carrier_name):
+                found = cls
+            stack.extend(cls.__subclasses__())
+        return found
+
+    def get_class(self, carrier_name):
+        """ Return the generator class of a carrier file type or None """
+        generator_class = self._classes.get(carrier_name)
+        if generator_class is None:
+            generator_class = self._find_class(carrier_name)
+            if generator_class is not None:
+                self._classes[carrier_name] = generator_class
+        return generator_class
+
+    def __contains__(self, carrier_name):
+        return self.get_class(carrier_name) is not None
+
+    def get(self, carrier_name):
+        """ Return the generator instance of a carrier file type """
+        generator = self._instances.get(carrier_name)
+        if generator is None:
+            generator_class = self.get_class(carrier_name)
+            if generator_class is None:
+                raise ValueError("No carrier file generator for the "
+                                 "type %s" % (carrier_name,))
+            generator = generator_class(carrier_name)
+            self._instances[carrier_name] = generator
+        return generator
+
+
+generator_registry = GeneratorRegistry()
+
+
+class CarrierFileGeneratorType(type):
+
+    """ Register the generators in the registry when they are defined
+
+    Only the classes declaring their own ``carrier_type`` are
+    registered, a subclass inheriting it is found by ``carrier_for``.
+    """
+
+    def __init__(cls, name, bases, attrs):
+        super(CarrierFileGeneratorType, cls).__init__(name, bases, attrs)
+        if attrs.get('carrier_type'):
+            generator_registry.register(cls)
+
 
 class CarrierFileGenerator(object):
 
+    __metaclass__ = CarrierFileGeneratorType
+
+    # type of carrier file (delivery.carrier.file.type) generated
+    carrier_type = None
+    # BaseLine subclass of the rows, gives the widths of the columns
+    # when the file is written with fixed width records
+    line_class = None
+    # delimiter of the CSV records when none is configured
+    csv_delimiter = ','
+    # fields used by _get_rows, read in bulk for all the pickings
+    # before the files are generated, as {field: None} for the
+    # plain fields and {field: {sub-field: ...}} for the many2one.
+    # When None, _get_rows receives browse records.
+    picking_fields = None
+
     def __init__(self, carrier_name):
         self.carrier_name = carrier_name
 
     @classmethod
     def carrier_for(cls, carrier_name):
-        return False
+        return bool(cls.carrier_type) and carrier_name == cls.carrier_type
 
     @staticmethod
     def sanitize_filename(name):
-        valid_chars = "-_.() %s%s" % (string.ascii_letters, string.digits)
-        return ''.join(c for c in name if c in valid_chars)
+        """ Remove the characters not allowed in a filename
+
+        All the allowed characters are ASCII, so the others are
+        dropped when encoding unicode names.
+        """
+        if isinstance(name, unicode):
+            name = name.encode('ascii', 'ignore')
+        return name.translate(None, _INVALID_FILENAME_CHARS)
 
     @staticmethod
     def _filename_date(timestamp=None):
@@ -47,14 +226,19 @@ class CarrierFileGenerator(object):
         Return a date to put in the filename, formatted like :
         20120214_094435 for 2012 february 14. at 09 hours 44 and 35 seconds
 
+        Without timestamp, the date is unique in the process: a sequence
+        is appended when several dates are asked in the same second,
+        like 20120214_094435_0001, see FilenameClock.
+
         :param datetime timestamp: optional datetime value to use instead of
                                    the current date and time
         :return: a date as str
         """
-        date = timestamp or datetime.datetime.now()
-        return date.strftime('%Y%m%d_%H%M%S')
+        if timestamp is None:
+            return filename_clock.next_date()
+        return timestamp.strftime('%Y%m%d_%H%M%S')
 
-    def generate_files(self, pickings, configuration):
+    def generate_files(self, pickings, configuration, stream=False):
         """
         Base method to generate the pickings files, one file per picking
         It returns a list of tuple with a filename, its content and a
@@ -63,14 +247,19 @@ class CarrierFileGenerator(object):
         :param browse_record pickings: list of browsable pickings records
         :param browse_record configuration: configuration of
                                             the file to generate
+        :param bool stream: when True, the content of the files is a
+                            StreamedFileContent rendered when it is
+                            written instead of a string
         :return: list of tuple with files to create like:
                  [('filename1', file, [picking ids]),
                   ('filename2', file2, [picking ids])]
         """
         if configuration.group_pickings:
-            return self._generate_files_grouped(pickings, configuration)
+            return self._generate_files_grouped(pickings, configuration,
+                                                stream=stream)
         else:
-            return self._generate_files_single(pickings, configuration)
+            return self._generate_files_single(pickings, configuration,
+                                               stream=stream)
 
     def _get_filename_single(self, picking, configuration, extension='csv'):
         """
@@ -113,10 +302,45 @@ class CarrierFileGenerator(object):
         """
         return NotImplementedError
 
+    def _iter_rows(self, pickings, configuration):
+        """
+        Yield the rows of all the pickings, one after the other.
+
+        :param browse_record pickings: list of browsable pickings records
+        :param browse_record configuration: configuration of
+                                            the file to generate
+        :return: iterator on the rows
+        """
+        for picking in pickings:
+            for row in self._get_rows(picking, configuration):
+                yield row
+
+    def _get_record_formatter(self, configuration):
+        """
+        Returns the formatter writing the rows according to the
+        record format and encoding of the configuration.
+
+        :param browse_record configuration: configuration of
+                                            the file to generate
+        :return: RecordFormatter instance
+        """
+        record_format = configuration.file_format or 'csv'
+        options = {'encoding': configuration.encoding or 'utf-8',
+                   'errors': configuration.encoding_errors or 'strict',
+                   }
+        if record_format == 'csv':
+            delimiter = configuration.csv_delimiter or self.csv_delimiter
+            # the csv module only accepts str delimiters
+            options['delimiter'] = str(delimiter)
+        return new_record_formatter(record_format,
+                                    line_class=self.line_class,
+                                    **options)
+
     def _write_rows(self, file_handle, rows, configuration):
         """
         Write the rows in the file (file_handle).
-        Inherit and implement in subclasses.
+        By default, the rows are written with the record formatter
+        of the configuration. Inherit to write a specific format.
 
         :param StringIO file_handle: file to write in
         :param rows: rows to write in the file
@@ -124,7 +348,9 @@ class CarrierFileGenerator(object):
                                             the file to generate
         :return: the file_handle as StringIO with the rows written in it
         """
-        return NotImplementedError
+        formatter = self._get_record_formatter(configuration)
+        formatter.write_rows(file_handle, rows)
+        return file_handle
 
     def _get_file(self, rows, configuration):
         """
@@ -147,7 +373,8 @@ class CarrierFileGenerator(object):
             file_handle.close()
         return file_content
 
-    def _generate_files_single(self, pickings, configuration):
+    def _generate_files_single(self, pickings, configuration,
+                               stream=False):
         """
         Base method to generate the pickings files, one file per picking
         It returns a list of tuple with a filename, its content and a
@@ -156,6 +383,9 @@ class CarrierFileGenerator(object):
         :param browse_record pickings: list of browsable pickings records
         :param browse_record configuration: configuration of
                                             the file to generate
+        :param bool stream: when True, the contents are returned as
+                            StreamedFileContent, the rows of a picking
+                            are generated only when its file is written
         :return: list of tuple with files to create like:
                  [('filename1', file, [picking ids]),
                   ('filename2', file2, [picking ids])]
@@ -164,12 +394,17 @@ class CarrierFileGenerator(object):
         for picking in pickings:
             filename = self._get_filename_single(picking, configuration)
             filename = self.sanitize_filename(filename)
-            rows = self._get_rows(picking, configuration)
-            file_content = self._get_file(rows, configuration)
+            if stream:
+                rows = self._iter_rows([picking], configuration)
+                file_content = StreamedFileContent(self, rows, configuration)
+            else:
+                rows = self._get_rows(picking, configuration)
+                file_content = self._get_file(rows, configuration)
             files.append((filename, file_content, [picking.id]))
         return files
 
-    def _generate_files_grouped(self, pickings, configuration):
+    def _generate_files_grouped(self, pickings, configuration,
+                                stream=False):
         """
         Base method to generate the pickings files, one file
         for all pickings
@@ -179,23 +414,29 @@ class CarrierFileGenerator(object):
         :param browse_record pickings: list of browsable pickings records
         :param browse_record configuration: configuration of
                                             the file to generate
+        :param bool stream: when True, the content is returned as a
+                            StreamedFileContent, the rows are generated
+                            only when it is written
         :return: list of tuple with files to create like:
                  [('filename1', file, [picking ids]),
                   ('filename2', file2, [picking ids])]
         """
         files = []
-        rows = []
         filename = self._get_filename_grouped(configuration)
         filename = self.sanitize_filename(filename)
-        for picking in pickings:
-            rows += self._get_rows(picking, configuration)
-        file_content = self._get_file(rows, configuration)
+        rows = self._iter_rows(pickings, configuration)
+        if stream:
+            file_content = StreamedFileContent(self, rows, configuration)
+        else:
+            file_content = self._get_file(rows, configuration)
         files.append((filename, file_content, [p.id for p in pickings]))
         return files
 
 
 def new_file_generator(carrier_name):
-    for cls in CarrierFileGenerator.__subclasses__():
-        if cls.carrier_for(carrier_name):
-            return cls(carrier_name)
-    raise ValueError
+    """ Return the generator of a carrier file type
+
+    The generators are shared, they must not keep a state
+    between the generation of files.
+    """
+    return generator_registry.get(carrier_name)
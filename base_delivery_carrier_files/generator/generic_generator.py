@@ -19,11 +19,8 @@
 #
 ##############################################################################
 
-import csv
-
 from .file_generator import CarrierFileGenerator
 from .base_line import BaseLine
-from openerp.addons.base_delivery_carrier_files.csv_writer import UnicodeWriter
 
 
 class GenericLine(BaseLine):
@@ -45,9 +42,26 @@ class GenericLine(BaseLine):
 
 class LaPosteFileGenerator(CarrierFileGenerator):
 
-    @classmethod
-    def carrier_for(cls, carrier_name):
-        return carrier_name == 'generic'
+    carrier_type = 'generic'
+    line_class = GenericLine
+    csv_delimiter = ','
+    picking_fields = {
+        'name': None,
+        'weight': None,
+        'partner_id': {'name': None,
+                       'street': None,
+                       'street2': None,
+                       'zip': None,
+                       'city': None,
+                       'state_id': {'name': None},
+                       'country_id': {'code': None},
+                       'phone': None,
+                       'mobile': None,
+                       'email': None,
+                       'fax': None,
+                       },
+        'carrier_id': {'name': None},
+    }
 
     def _get_rows(self, picking, configuration):
         """
@@ -78,18 +92,3 @@ class LaPosteFileGenerator(CarrierFileGenerator):
         line.delivery_name = picking.carrier_id and picking.carrier_id.name
         line.weight = "%.2f" % (picking.weight,)
         return [line.get_fields()]
-
-    def _write_rows(self, file_handle, rows, configuration):
-        """
-        Write the rows in the file (file_handle)
-
-        :param StringIO file_handle: file to write in
-        :param rows: rows to write in the file
-        :param browse_record configuration: configuration of
-                                            the file to generate
-        :return: the file_handle as StringIO with the rows written in it
-        """
-        writer = UnicodeWriter(file_handle, delimiter=',', quotechar='"',
-                               lineterminator='\n', quoting=csv.QUOTE_ALL)
-        writer.writerows(rows)
-        return file_handle
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    Author: Guewen Baconnier
+#    Copyright 2012 Camptocamp SA
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+import csv
+import codecs
+from itertools import izip
+
+from ..csv_writer import UnicodeWriter
+
+
+class RecordFormatter(object):
+
+    """
+    Write the rows of a carrier file in a file handle according to
+    a record format (CSV, fixed width, ...) and a target encoding.
+
+    A row is a list of values as returned by BaseLine.get_fields.
+    """
+
+    def __init__(self, encoding='utf-8', errors='strict',
+                 lineterminator='\n'):
+        codecs.lookup(encoding)  # fail early on unknown encodings
+        codecs.lookup_error(errors)
+        self.encoding = encoding
+        self.errors = errors
+        self.lineterminator = lineterminator
+
+    def write_rows(self, file_handle, rows):
+        """
+        Write the rows in the file (file_handle)
+
+        :param file file_handle: file to write in
+        :param rows: iterable of rows to write in the file
+        :return: the file_handle
+        """
+        raise NotImplementedError
+
+
+class CsvRecordFormatter(RecordFormatter):
+
+    """ Quoted CSV records """
+
+    def __init__(self, delimiter=',', quotechar='"',
+                 quoting=csv.QUOTE_ALL, **kwargs):
+        super(CsvRecordFormatter, self).__init__(**kwargs)
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.quoting = quoting
+
+    def write_rows(self, file_handle, rows):
+        writer = UnicodeWriter(file_handle,
+                               encoding=self.encoding,
+                               errors=self.errors,
+                               delimiter=self.delimiter,
+                               quotechar=self.quotechar,
+                               lineterminator=self.lineterminator,
+                               quoting=self.quoting)
+        writer.writerows(rows)
+        return file_handle
+
+
+class FixedWidthRecordFormatter(RecordFormatter):
+
+    """
+    Fixed width records: each value is truncated or padded to the width
+    of its column.
+
+    The widths are counted in characters, so they match the widths in
+    bytes only with single-byte encodings (latin-1, cp1252, ...).
+    """
+
+    def __init__(self, widths, fillchar=u' ', buffer_rows=1000, **kwargs):
+        super(FixedWidthRecordFormatter, self).__init__(**kwargs)
+        if not widths or not all(widths):
+            raise ValueError("A width is required for every column "
+                             "of a fixed width record")
+        self.widths = tuple(widths)
+        self.fillchar = fillchar
+        self.buffer_rows = buffer_rows
+
+    def format_row(self, row):
+        """ Return the record of a row as unicode """
+        fillchar = self.fillchar
+        return u''.join([
+            (value if isinstance(value, unicode)
+             else unicode(value))[:width].ljust(width, fillchar)
+            for value, width in izip(row, self.widths)])
+
+    def write_rows(self, file_handle, rows):
+        format_row = self.format_row
+        lineterminator = unicode(self.lineterminator)
+        records = []
+        for row in rows:
+            records.append(format_row(row))
+            if len(records) >= self.buffer_rows:
+                self._flush(file_handle, records, lineterminator)
+                records = []
+        self._flush(file_handle, records, lineterminator)
+        return file_handle
+
+    def _flush(self, file_handle, records, lineterminator):
+        if not records:
+            return
+        # encode a whole batch of records at once
+        data = lineterminator.join(records) + lineterminator
+        file_handle.write(data.encode(self.encoding, self.errors))
+
+
+def new_record_formatter(record_format, line_class=None, **kwargs):
+    """
+    Return the record formatter for a record format
+
+    :param str record_format: 'csv' or 'fixed_width'
+    :param line_class: BaseLine subclass of the rows, gives the widths
+                       of the columns for the fixed width records
+    :param kwargs: options of the formatter (encoding, errors,
+                   delimiter, ...)
+    :return: RecordFormatter instance
+    """
+    if record_format == 'csv':
+        return CsvRecordFormatter(**kwargs)
+    elif record_format == 'fixed_width':
+        widths = line_class._widths if line_class is not None else None
+        return FixedWidthRecordFormatter(widths, **kwargs)
+    raise ValueError("Unknown record format %s" % (record_format,))
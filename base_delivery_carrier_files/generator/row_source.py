@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+#
+#    Author: Guewen Baconnier
+#    Copyright 2012 Camptocamp SA
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+
+class RowSource(object):
+
+    """
+    Lightweight read-only record used by the generators in place
+    of a browse record.
+
+    The values are read in bulk for all the pickings of a file before
+    the rows are generated, so accessing an attribute never triggers
+    a query. The many2one fields are RowSource themselves, or
+    EMPTY_ROW_SOURCE when not set (falsy, like a browse_null).
+    """
+
+    __slots__ = ('id', '_values')
+
+    def __init__(self, record_id, values):
+        self.id = record_id
+        self._values = values
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(
+                "Field '%s' has not been read, add it to the "
+                "'picking_fields' of the generator" % name)
+
+    def __nonzero__(self):
+        return bool(self.id)
+
+    def __repr__(self):
+        return "RowSource(%s)" % (self.id,)
+
+
+class EmptyRowSource(RowSource):
+
+    """ Empty many2one, all its fields are None """
+
+    __slots__ = ()
+
+    def __init__(self):
+        super(EmptyRowSource, self).__init__(False, {})
+
+    def __getattr__(self, name):
+        return None
+
+
+EMPTY_ROW_SOURCE = EmptyRowSource()
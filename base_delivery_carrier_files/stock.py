@@ -19,7 +19,10 @@
 #
 ##############################################################################
 
+import logging
+
 from openerp.osv import orm, fields
+from openerp.tools import ustr
 
 
 class stock_picking(orm.Model):
@@ -31,8 +34,72 @@ class stock_picking(orm.Model):
                                                  help="The file for the "
                                                       "delivery carrier "
                                                       "has been generated."),
+        'carrier_file_pending': fields.boolean(
+            'Carrier File Pending',
+            readonly=True,
+            help="The delivery order has been processed, its carrier "
+                 "file will be exported by the next run of the "
+                 "scheduled action."),
     }
 
+    def init(self, cr):
+        # the scheduled action searches the pending pickings every few
+        # minutes, only a few of them are pending so index only them
+        cr.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s",
+                   ('stock_picking_carrier_file_pending_index',))
+        if not cr.fetchone():
+            cr.execute("""
+                CREATE INDEX stock_picking_carrier_file_pending_index
+                ON stock_picking (id)
+                WHERE carrier_file_pending
+                """)
+
+    def _get_pickings_by_carrier_file(self, cr, uid, ids, auto=True,
+                                      recreate=False, context=None):
+        """
+        Returns the pickings which need a carrier file grouped by
+        carrier file configuration.
+        The pickings are selected with one search, without loading
+        them, so it can be used on a large number of pickings.
+
+        :param list ids: list of ids of pickings for which we need a file
+        :param auto: only keep the carrier files set as "auto_export"
+        :param recreate: keep the pickings for which a file
+                         has already been generated
+        :return: dict {carrier file id: [picking ids]}
+        """
+        domain = [('id', 'in', ids),
+                  ('type', '=', 'out'),
+                  ('carrier_id.carrier_file_id', '!=', False),
+                  ]
+        if not recreate:
+            domain.append(('carrier_file_generated', '=', False))
+        if auto:
+            domain.append(('carrier_id.carrier_file_id.auto_export',
+                           '=', True))
+        # the pickings of archived carriers are exported too
+        search_context = dict(context or {}, active_test=False)
+        picking_ids = self.search(cr, uid, domain, order='id',
+                                  context=search_context)
+        if not picking_ids:
+            return {}
+        # only read the ids of the carriers, then the carrier file
+        # of the few distinct carriers
+        pickings = self.read(cr, uid, picking_ids, ['carrier_id'],
+                             context=context, load='_classic_write')
+        carrier_ids = list(set(picking['carrier_id'] for picking in pickings))
+        carriers = self.pool['delivery.carrier'].read(
+            cr, uid, carrier_ids, ['carrier_file_id'],
+            context=context, load='_classic_write')
+        carrier_files = dict((carrier['id'], carrier['carrier_file_id'])
+                             for carrier in carriers)
+        carrier_file_ids = {}
+        for picking in pickings:
+            p_carrier_file_id = carrier_files[picking['carrier_id']]
+            carrier_file_ids.setdefault(p_carrier_file_id, []).\
+                append(picking['id'])
+        return carrier_file_ids
+
     def generate_carrier_files(self, cr, uid, ids, auto=True,
                                recreate=False, context=None):
         """
@@ -48,37 +115,98 @@ class stock_picking(orm.Model):
                      or called manually from the wizard. When auto is True,
                      only the carrier files set as "auto_export"
                      are exported
-        :return: True if successful
+        :return: report of the generation with the ids of the pickings
+                 written in a file and the files which failed, see
+                 delivery.carrier.file._write_files
         """
         carrier_file_obj = self.pool.get('delivery.carrier.file')
-        carrier_file_ids = {}
-        for picking in self.browse(cr, uid, ids, context):
-            if picking.type != 'out':
-                continue
-            if not recreate and picking.carrier_file_generated:
-                continue
-            carrier = picking.carrier_id
-            if not carrier or not carrier.carrier_file_id:
-                continue
-            if auto and not carrier.carrier_file_id.auto_export:
-                continue
-            p_carrier_file_id = picking.carrier_id.carrier_file_id.id
-            carrier_file_ids.setdefault(p_carrier_file_id, []).\
-                append(picking.id)
+        carrier_file_ids = self._get_pickings_by_carrier_file(
+            cr, uid, ids, auto=auto, recreate=recreate, context=context)
 
+        report = {'generated_picking_ids': [], 'failed': []}
         for carrier_file_id, carrier_picking_ids\
                 in carrier_file_ids.iteritems():
-            carrier_file_obj.generate_files(cr, uid, carrier_file_id,
-                                            carrier_picking_ids,
-                                            context=context)
-        return True
+            file_report = carrier_file_obj.generate_files(
+                cr, uid, carrier_file_id, carrier_picking_ids,
+                context=context)
+            report['generated_picking_ids'] += \
+                file_report['generated_picking_ids']
+            report['failed'] += file_report['failed']
+        return report
 
     def action_done(self, cr, uid, ids, context=None):
+        """ Only mark the delivery orders as pending for the automatic
+        export, the files are generated by a scheduled action
+        (run_carrier_file_export) so the validation of the
+        delivery orders does not wait for the export.
+        """
         result = super(stock_picking, self).action_done(cr, uid, ids,
                                                         context=context)
-        self.generate_carrier_files(cr, uid, ids, auto=True, context=context)
+        carrier_file_ids = self._get_pickings_by_carrier_file(
+            cr, uid, ids, auto=True, context=context)
+        pending_ids = [picking_id for picking_ids
+                       in carrier_file_ids.itervalues()
+                       for picking_id in picking_ids]
+        if pending_ids:
+            self.write(cr, uid, pending_ids,
+                       {'carrier_file_pending': True},
+                       context=context)
         return result
 
+    def run_carrier_file_export(self, cr, uid, context=None):
+        """
+        Export the carrier files of the delivery orders pending for
+        the automatic export. Called by the scheduled action.
+
+        The pending delivery orders are exported together, so they are
+        grouped in one file per carrier file configuration when it is
+        set to group the pickings.
+
+        Each carrier file configuration is exported in its own
+        savepoint, so a failure while the files are generated only
+        rollbacks the export of its pickings.
+        The pickings for which the file could not be generated or
+        written are no longer pending, their files can still be
+        generated manually.
+
+        :return: report of the generation, see generate_carrier_files
+        """
+        log = logging.getLogger('delivery.carrier.file')
+        report = {'generated_picking_ids': [], 'failed': []}
+        pending_ids = self.search(cr, uid,
+                                  [('carrier_file_pending', '=', True)],
+                                  order='id', context=context)
+        if not pending_ids:
+            return report
+        carrier_file_obj = self.pool.get('delivery.carrier.file')
+        carrier_file_ids = self._get_pickings_by_carrier_file(
+            cr, uid, pending_ids, auto=True, context=context)
+        for carrier_file_id, carrier_picking_ids\
+                in carrier_file_ids.iteritems():
+            cr.execute('SAVEPOINT carrier_file_export')
+            try:
+                file_report = carrier_file_obj.generate_files(
+                    cr, uid, carrier_file_id, carrier_picking_ids,
+                    context=context)
+            except Exception as e:
+                cr.execute('ROLLBACK TO SAVEPOINT carrier_file_export')
+                log.exception("Could not export the carrier file %s "
+                              "for pickings %s: %s",
+                              carrier_file_id, carrier_picking_ids, e)
+                carrier_file = carrier_file_obj.browse(
+                    cr, uid, carrier_file_id, context=context)
+                report['failed'].append(
+                    (carrier_file.name, carrier_picking_ids, ustr(e)))
+                continue
+            cr.execute('RELEASE SAVEPOINT carrier_file_export')
+            report['generated_picking_ids'] += \
+                file_report['generated_picking_ids']
+            report['failed'] += file_report['failed']
+        self.write(cr, uid, pending_ids,
+                   {'carrier_file_pending': False},
+                   context=context)
+        return report
+
 
 class stock_picking_out(orm.Model):
     _inherit = 'stock.picking.out'
@@ -89,11 +217,18 @@ class stock_picking_out(orm.Model):
                                                  help="The file for "
                                                  "the delivery carrier "
                                                  "has been generated."),
+        'carrier_file_pending': fields.boolean(
+            'Carrier File Pending',
+            readonly=True,
+            help="The delivery order has been processed, its carrier "
+                 "file will be exported by the next run of the "
+                 "scheduled action."),
     }
 
     def copy(self, cr, uid, rec_id, default=None, context=None):
         if default is None:
             default = {}
-        default.update({'carrier_file_generated': False})
+        default.update({'carrier_file_generated': False,
+                        'carrier_file_pending': False})
         return super(stock_picking_out, self).copy(cr, uid, rec_id, default,
                                                    context=context)
@@ -45,27 +45,66 @@ class DeliveryCarrierFileGenerate(orm.TransientModel):
                  "for selected picking even if they already had one.\n"
                  "By default, delivery orders with existing file will be "
                  "skipped."),
+        'state': fields.selection([('draft', 'Draft'),
+                                   ('done', 'Done')],
+                                  'State', readonly=True),
+        'failure_report': fields.text('Failures', readonly=True),
     }
 
     _defaults = {
         'picking_ids': _get_picking_ids,
+        'state': 'draft',
     }
 
+    def _format_failure_report(self, cr, uid, failed, context=None):
+        """ Returns a text listing the files which could not be written
+        with their delivery orders and the error
+
+        :param list failed: list of (filename, [picking ids], error)
+        """
+        picking_obj = self.pool['stock.picking']
+        lines = []
+        for filename, picking_ids, error in failed:
+            names = [name for __, name in
+                     picking_obj.name_get(cr, uid, picking_ids,
+                                          context=context)]
+            lines.append(u'%s (%s): %s' %
+                         (filename, u', '.join(names), error))
+        return '\n'.join(lines)
+
     def action_generate(self, cr, uid, ids, context=None):
         """
         Call the creation of the delivery carrier files
         """
         context = context or {}
-        form = self.browse(cr, uid, ids, context=context)[0]
-        if not form.picking_ids:
+        # read only the ids of the delivery orders, they are
+        # filtered in generate_carrier_files without being loaded
+        form = self.read(cr, uid, ids[0], ['picking_ids', 'recreate'],
+                         context=context)
+        picking_ids = form['picking_ids']
+        if not picking_ids:
             raise orm.except_orm(_('Error'), _('No delivery orders selected'))
 
         picking_obj = self.pool['stock.picking']
-        picking_ids = [picking.id for picking in form.picking_ids]
-        picking_obj.generate_carrier_files(cr, uid,
-                                           picking_ids,
-                                           auto=False,
-                                           recreate=form.recreate,
-                                           context=context)
+        report = picking_obj.generate_carrier_files(cr, uid,
+                                                    picking_ids,
+                                                    auto=False,
+                                                    recreate=form['recreate'],
+                                                    context=context)
+        if not report['failed']:
+            return {'type': 'ir.actions.act_window_close'}
 
-        return {'type': 'ir.actions.act_window_close'}
+        failure_report = self._format_failure_report(
+            cr, uid, report['failed'], context=context)
+        self.write(cr, uid, [form['id']],
+                   {'state': 'done', 'failure_report': failure_report},
+                   context=context)
+        # display the delivery orders for which the file failed
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': form['id'],
+            'view_type': 'form',
+            'view_mode': 'form',
+            'target': 'new',
+        }
@@ -20,8 +20,12 @@
 ##############################################################################
 
 import base64
+import tempfile
 
 from openerp.osv import orm, fields
+from openerp.addons.base_delivery_carrier_files.generator import (
+    StreamedFileContent
+)
 
 
 class CarrierFile(orm.Model):
@@ -43,30 +47,83 @@ class CarrierFile(orm.Model):
     }
 
     def _prepare_attachment(self, carrier_file, filename, file_content,
-                            context):
-        if carrier_file.auto_export:
-            assert context is not None and 'picking_id' in context, \
-                ('When carrier_file is in mode auto_export, picking_id must '
-                 'be in context')
-            res_id = context['picking_id']
-        else:
-            res_id = False
+                            context, picking_ids=None):
+        picking_ids = picking_ids or []
         return {'name': "%s_%s" % (carrier_file.name, filename),
                 'datas_fname': filename,
                 'datas': base64.encodestring(file_content),
                 'parent_id': carrier_file.document_directory_id.id,
                 'type': 'binary',
                 'res_model': 'stock.picking.out',
-                'res_id': res_id}
+                'res_id': picking_ids[0] if picking_ids else False,
+                'carrier_file_picking_ids': [(6, 0, picking_ids)]}
+
+    @staticmethod
+    def _get_content(file_content):
+        """ Return the content of a file as a string """
+        if isinstance(file_content, StreamedFileContent):
+            # render the rows in a temporary file rather than
+            # in memory, the attachment needs the whole content
+            with tempfile.TemporaryFile() as file_handle:
+                file_content.write_to(file_handle)
+                file_handle.seek(0)
+                file_content = file_handle.read()
+        return file_content
+
+    def _create_attachment(self, cr, uid, carrier_file, filename,
+                           file_content, picking_ids, context=None):
+        """
+        Create the attachment of a file, linked to all the pickings
+        of the file.
+
+        :param browse_record carrier_file: browsable carrier file
+                                           configuration
+        :param str filename: name of the file
+        :param file_content: string or StreamedFileContent
+        :param list picking_ids: ids of the pickings in the file
+        :return: id of the attachment
+        """
+        vals = self._prepare_attachment(carrier_file, filename,
+                                        self._get_content(file_content),
+                                        context=context,
+                                        picking_ids=picking_ids)
+        return self.pool['ir.attachment'].create(cr, uid, vals,
+                                                 context=context)
+
+    def _write_picking_file(self, cr, uid, carrier_file, filename,
+                            file_content, picking_ids, context=None):
+        if carrier_file.write_mode == 'document':
+            self._create_attachment(cr, uid, carrier_file, filename,
+                                    file_content, picking_ids,
+                                    context=context)
+            return True
+        return super(CarrierFile, self)._write_picking_file(
+            cr, uid, carrier_file, filename, file_content, picking_ids,
+            context=context)
 
     def _write_file(self, cr, uid, carrier_file, filename, file_content,
                     context=None):
         if carrier_file.write_mode == 'document':
-            vals = self._prepare_attachment(carrier_file, filename,
-                                            file_content, context=context)
-            self.pool['ir.attachment'].create(cr, uid, vals, context=context)
+            # the pickings of the file are unknown here, the attachment
+            # is not linked to them
+            self._create_attachment(cr, uid, carrier_file, filename,
+                                    file_content, [], context=context)
             return True
         else:
             return (super(CarrierFile, self)
                     ._write_file(cr, uid, carrier_file, filename, file_content,
                                  context=context))
+
+
+class ir_attachment(orm.Model):
+    _inherit = 'ir.attachment'
+
+    _columns = {
+        'carrier_file_picking_ids': fields.many2many(
+            'stock.picking',
+            'carrier_file_attachment_picking_rel',
+            'attachment_id', 'picking_id',
+            string='Carrier File Pickings',
+            readonly=True,
+            help="Delivery orders contained in the carrier file."),
+    }
@@ -6,3 +6,5 @@ from . import stock_picking
 from . import stock_quant_package
 from . import shipping_label
 from . import carrier_account
+from . import res_company
+from . import res_partner
@@ -2,7 +2,7 @@
 # Copyright 2012 Akretion <http://www.akretion.com>.
 # Copyright 2013-2016 Camptocamp SA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
-from openerp import api, fields, models
+from openerp import api, fields, models, tools
 
 
 class DeliveryCarrier(models.Model):
@@ -29,11 +29,25 @@ class DeliveryCarrier(models.Model):
         string='Option',
     )
 
+    @api.model
+    @tools.ormcache('carrier_id')
+    def _get_default_option_ids(self, carrier_id):
+        """ Returns the ids of the default and available options of
+        a carrier. Cached, the cache is cleared when the options are
+        modified.
+        """
+        options = self.env['delivery.carrier.option'].search(
+            [('carrier_id', '=', carrier_id),
+             '|',
+             ('mandatory', '=', True),
+             ('by_default', '=', True),
+             ])
+        return tuple(options.ids)
+
     @api.multi
     def default_options(self):
         """ Returns default and available options for a carrier """
-        options = self.env['delivery.carrier.option'].browse()
-        for available_option in self.available_option_ids:
-            if (available_option.mandatory or available_option.by_default):
-                options |= available_option
-        return options
+        option_ids = []
+        for carrier in self:
+            option_ids += self._get_default_option_ids(carrier.id)
+        return self.env['delivery.carrier.option'].browse(option_ids)
@@ -2,7 +2,7 @@
 # Copyright 2012 Akretion <http://www.akretion.com>.
 # Copyright 2013-2016 Camptocamp SA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
-from openerp import fields, models
+from openerp import api, fields, models
 
 
 class DeliveryCarrierOption(models.Model):
@@ -38,3 +38,22 @@ class DeliveryCarrierOption(models.Model):
         help="When True, help to prevent the user to modify some fields "
              "option (if attribute is defined in the view)"
     )
+
+    @api.model
+    def create(self, vals):
+        option = super(DeliveryCarrierOption, self).create(vals)
+        # the default options of the carriers are cached
+        self.env['delivery.carrier'].clear_caches()
+        return option
+
+    @api.multi
+    def write(self, vals):
+        result = super(DeliveryCarrierOption, self).write(vals)
+        self.env['delivery.carrier'].clear_caches()
+        return result
+
+    @api.multi
+    def unlink(self):
+        result = super(DeliveryCarrierOption, self).unlink()
+        self.env['delivery.carrier'].clear_caches()
+        return result
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+# Copyright 2013-2016 Camptocamp SA
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from openerp import api, models
+
+
+class ResCompany(models.Model):
+    _inherit = 'res.company'
+
+    @api.multi
+    def write(self, vals):
+        result = super(ResCompany, self).write(vals)
+        if 'partner_id' in vals:
+            # the sender address of the labels depends on the partner
+            self.env['stock.picking'].clear_caches()
+        return result
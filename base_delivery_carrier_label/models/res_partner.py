@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Copyright 2013-2016 Camptocamp SA
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from openerp import api, models
+
+# fields changing the delivery address found by address_get
+SENDER_ADDRESS_FIELDS = ('type', 'parent_id', 'active', 'child_ids')
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    @api.multi
+    def _is_company_sender_partner(self):
+        """ Return True if one of the partners is the partner of a
+        company or one of its contacts, so it can change the sender
+        address of the labels """
+        partners = (self |
+                    self.mapped('parent_id') |
+                    self.mapped('commercial_partner_id'))
+        company_model = self.env['res.company'].sudo()
+        return bool(company_model.search_count(
+            [('partner_id', 'in', partners.ids)]))
+
+    @api.model
+    def create(self, vals):
+        partner = super(ResPartner, self).create(vals)
+        if vals.get('parent_id') and partner._is_company_sender_partner():
+            # a new contact can become the sender address of the labels
+            self.env['stock.picking'].clear_caches()
+        return partner
+
+    @api.multi
+    def write(self, vals):
+        if not any(field in vals for field in SENDER_ADDRESS_FIELDS):
+            return super(ResPartner, self).write(vals)
+        # the partners may be moved away from a company, check before
+        clear = self._is_company_sender_partner()
+        result = super(ResPartner, self).write(vals)
+        if clear or self._is_company_sender_partner():
+            self.env['stock.picking'].clear_caches()
+        return result
+
+    @api.multi
+    def unlink(self):
+        clear = self._is_company_sender_partner()
+        result = super(ResPartner, self).unlink()
+        if clear:
+            self.env['stock.picking'].clear_caches()
+        return result
@@ -2,7 +2,10 @@
 # Copyright 2016 Hpar
 # Copyright 2016 Camptocamp SA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from collections import defaultdict
+
 from openerp import api, fields, models
+from openerp.tools import float_compare, float_round
 import openerp.addons.decimal_precision as dp
 import logging
 
@@ -17,34 +20,94 @@ class StockPackOperation(models.Model):
         help="Weight of the pack_operation"
     )
 
+    @api.multi
+    def _get_weight_values(self):
+        """Compute the weight in kg of pack.operations.
+
+        The quantities and the products of all the operations are read
+        with one query. The quantity of an operation is converted in the
+        unit of measure of its product. When the unit of measure of the
+        product is a unit of weight, the weight of the product is
+        expressed in this unit and converted in kg.
+
+        return:
+            a dict {operation id: (weight, stored weight)}, the weight
+            being None when the quantity cannot be converted in the
+            unit of measure of the product
+        """
+        if not self.ids:
+            return {}
+        self.env.cr.execute("""
+            SELECT spo.id, spo.weight, spo.product_qty, spo.product_uom_id,
+                   pt.weight, pt.uom_id
+            FROM stock_pack_operation spo
+            LEFT JOIN product_product pp ON pp.id = spo.product_id
+            LEFT JOIN product_template pt ON pt.id = pp.product_tmpl_id
+            WHERE spo.id IN %s
+            """, (tuple(self.ids),))
+        rows = self.env.cr.fetchall()
+        kg = self.env.ref('product.product_uom_kgm')
+        uom_ids = set(row[3] for row in rows) | set(row[5] for row in rows)
+        uom_ids.discard(None)
+        # browsed together, the units are read at once
+        uoms = dict((uom.id, uom) for uom in
+                    self.env['product.uom'].browse(list(uom_ids)))
+        values = {}
+        for (operation_id, stored_weight, qty, operation_uom_id,
+                product_weight, product_uom_id) in rows:
+            operation_uom = uoms.get(operation_uom_id)
+            product_uom = uoms.get(product_uom_id)
+            qty = qty or 0.0
+            if operation_uom and product_uom and \
+                    operation_uom != product_uom:
+                if operation_uom.category_id == product_uom.category_id:
+                    qty = qty / operation_uom.factor * product_uom.factor
+                else:
+                    _logger.warning(
+                        'Cannot convert the quantity of operation %s '
+                        'from %s to %s', operation_id,
+                        operation_uom.name, product_uom.name)
+                    values[operation_id] = (None, stored_weight)
+                    continue
+            weight = (product_weight or 0.0) * qty
+            if product_uom and product_uom != kg and \
+                    product_uom.category_id == kg.category_id:
+                weight = weight / product_uom.factor * kg.factor
+            values[operation_id] = (weight, stored_weight)
+        return values
+
     @api.multi
     def get_weight(self):
         """Calc and save weight of pack.operations.
 
-        Warning: Type conversion not implemented
-                it will return False if at least one uom or uos not in kg
+        The weights are computed for all the operations at once, see
+        _get_weight_values, and the operations having the same weight
+        are written together.
+
         return:
-            the sum of the weight of [self]
+            the sum of the weight of [self], False when the weight of
+            an operation cannot be computed
         """
-        total_weight = 0
-        kg = self.env.ref('product.product_uom_kgm').id
-        units = self.env.ref('product.product_uom_unit').id
-        allowed = (False, kg, units)
-        cant_calc_total = False
-        for operation in self:
-            product = operation.product_id
-
-            # if not defined we assume it's in kg
-            if product.uom_id.id not in allowed:
-                _logger.warning(
-                    'Type conversion not implemented for product %s' %
-                    product.id)
-                cant_calc_total = True
-
-            operation.weight = (product.weight * operation.product_qty)
-
-            total_weight += operation.weight
-
-        if cant_calc_total:
+        values = self._get_weight_values()
+        self._store_weight(values)
+        weights = [weight for weight, __ in values.itervalues()]
+        if None in weights:
             return False
-        return total_weight
+        return sum(weights)
+
+    @api.model
+    def _store_weight(self, values):
+        """Write the weights returned by _get_weight_values, the
+        operations having the same weight are written together.
+        The unknown weights are not written."""
+        precision = dp.get_precision('Stock Weight')(self.env.cr)[1]
+        to_write = defaultdict(list)
+        for operation_id, (weight, stored_weight) in values.iteritems():
+            if weight is None:
+                continue
+            weight = float_round(weight, precision_digits=precision)
+            if float_compare(weight, stored_weight or 0.0,
+                             precision_digits=precision):
+                to_write[weight].append(operation_id)
+        for weight, operation_ids in to_write.iteritems():
+            self.browse(operation_ids).write({'weight': weight})
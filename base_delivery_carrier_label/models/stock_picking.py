@@ -2,7 +2,7 @@
 # Copyright 2012-2015 Akretion <http://www.akretion.com>.
 # Copyright 2013-2016 Camptocamp SA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
-from openerp import _, api, fields, models
+from openerp import _, api, fields, models, tools
 from openerp.exceptions import UserError
 
 
@@ -77,6 +77,22 @@ class StockPicking(models.Model):
             labels.append(pack_label)
         return labels
 
+    @api.multi
+    def _generate_picking_shipping_labels(self, packages):
+        """ Generate the shipping labels of all the packages of a picking
+
+        Called by generate_labels with the packages of the picking,
+        found at once for all the pickings. By default, it calls
+        generate_shipping_labels, the carrier modules needing the
+        packages can inherit it to use them.
+
+        :param packages: recordset of all the stock.quant.package of
+                         the picking
+        :return: list of labels, see generate_shipping_labels
+        """
+        self.ensure_one()
+        return self.generate_shipping_labels()
+
     @api.multi
     def generate_labels(self, package_ids=None):
         """ Generate the labels.
@@ -87,13 +103,20 @@ class StockPicking(models.Model):
         """
         label_obj = self.env['shipping.label']
 
+        # the packages of all the pickings are found with one query
+        packages_by_picking = {}
+        if not package_ids:
+            packages_by_picking = self._get_packages_by_picking()
+
         for pick in self:
             if package_ids:
                 shipping_labels = pick.generate_shipping_labels(
                     package_ids=package_ids
                 )
             else:
-                shipping_labels = pick.generate_shipping_labels()
+                shipping_labels = pick._generate_picking_shipping_labels(
+                    packages_by_picking[pick.id]
+                )
             for label in shipping_labels:
                 data = {
                     'name': label['name'],
@@ -163,35 +186,73 @@ class StockPicking(models.Model):
 
     @api.model
     def _values_with_carrier_options(self, values):
-        values = values.copy()
-        carrier_id = values.get('carrier_id')
-        option_ids = values.get('option_ids')
-        if carrier_id and not option_ids:
-            carrier_obj = self.env['delivery.carrier']
-            carrier = carrier_obj.browse(carrier_id)
-            default_options = carrier.default_options()
-            if default_options:
-                values.update(option_ids=[(6, 0, default_options.ids)])
-        return values
+        return self._values_list_with_carrier_options([values])[0]
+
+    @api.model
+    def _values_list_with_carrier_options(self, values_list):
+        """ Add the default options of their carrier in a list of values
+        for pickings, the default options of a carrier are looked up
+        once for all the values """
+        carrier_obj = self.env['delivery.carrier']
+        carrier_options = {}
+        result = []
+        for values in values_list:
+            values = values.copy()
+            carrier_id = values.get('carrier_id')
+            if carrier_id and not values.get('option_ids'):
+                if carrier_id not in carrier_options:
+                    carrier = carrier_obj.browse(carrier_id)
+                    carrier_options[carrier_id] = carrier.default_options()
+                default_options = carrier_options[carrier_id]
+                if default_options:
+                    values.update(option_ids=[(6, 0, default_options.ids)])
+            result.append(values)
+        return result
+
+    @api.model
+    def create_with_carrier_options(self, values_list):
+        """ Create many pickings, the default options of the carriers
+        are applied to all the values at once
+
+        :param values_list: list of dicts of values for the pickings
+        :return: the created pickings
+        """
+        pickings = self.browse()
+        for values in self._values_list_with_carrier_options(values_list):
+            pickings |= self.create(values)
+        return pickings
 
     @api.multi
     @api.returns('stock.quant.package')
     def _get_packages_from_picking(self):
         """ Get all the packages from the picking """
         self.ensure_one()
-        operation_obj = self.env['stock.pack.operation']
-        packages = self.env['stock.quant.package'].browse()
-        operations = operation_obj.search(
-            ['|',
-             ('package_id', '!=', False),
-             ('result_package_id', '!=', False),
-             ('picking_id', '=', self.id)]
-        )
-        for operation in operations:
-            # Take the destination package. If empty, the package is
-            # moved so take the source one.
-            packages |= operation.result_package_id or operation.package_id
-        return packages
+        return self._get_packages_by_picking()[self.id]
+
+    @api.multi
+    def _get_packages_by_picking(self):
+        """ Get the packages of many pickings with one query
+
+        :return: dict {picking id: stock.quant.package recordset}
+        """
+        if not self.ids:
+            return {}
+        package_ids = dict((picking_id, []) for picking_id in self.ids)
+        # Take the destination package. If empty, the package is
+        # moved so take the source one.
+        self.env.cr.execute("""
+            SELECT picking_id, COALESCE(result_package_id, package_id)
+            FROM stock_pack_operation
+            WHERE picking_id IN %s
+            AND (package_id IS NOT NULL OR result_package_id IS NOT NULL)
+            ORDER BY id
+            """, (tuple(self.ids),))
+        for picking_id, package_id in self.env.cr.fetchall():
+            if package_id not in package_ids[picking_id]:
+                package_ids[picking_id].append(package_id)
+        package_obj = self.env['stock.quant.package']
+        return dict((picking_id, package_obj.browse(ids))
+                    for picking_id, ids in package_ids.iteritems())
 
     @api.multi
     def write(self, vals):
@@ -236,9 +297,36 @@ class StockPicking(models.Model):
             delivery_carrier_label_yourcarrier_yourproject.
         """
         self.ensure_one()
-        partner = self.company_id.partner_id
-        address_id = partner.address_get(adr_pref=['delivery'])['delivery']
-        return self.env['res.partner'].browse(address_id)
+        return self.env['res.partner'].browse(
+            self._get_company_sender_address_id(self.company_id))
+
+    @api.model
+    def _get_company_sender_address_id(self, company):
+        """ Return the id of the delivery address of a company """
+        return self._get_company_sender_address_id_cached(company.id)
+
+    @api.model
+    @tools.ormcache('company_id')
+    def _get_company_sender_address_id_cached(self, company_id):
+        """ Cached, the cache is cleared when the partner of a company
+        or one of its contacts is modified """
+        company = self.env['res.company'].browse(company_id)
+        partner = company.partner_id
+        return partner.address_get(adr_pref=['delivery'])['delivery']
+
+    @api.multi
+    def _get_label_sender_addresses(self):
+        """ Return the sender address of many pickings
+
+        Relies on _get_label_sender_address, the address of a company
+        being searched only once. Inherit it when the customized sender
+        addresses can be found for many pickings at once, for instance
+        from the shop or brand of the pickings.
+
+        :return: dict {picking id: res.partner record}
+        """
+        return dict((picking.id, picking._get_label_sender_address())
+                    for picking in self)
 
     @api.multi
     def _check_existing_shipping_label(self):
@@ -2,6 +2,8 @@
 # Copyright 2014-2015 Akretion <http://www.akretion.com>
 # Copyright 2014-2016 Camptocamp SA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from collections import defaultdict
+
 from openerp import api, fields, models
 import openerp.addons.decimal_precision as dp
 
@@ -20,36 +22,80 @@ class StockQuantPackage(models.Model):
     def _compute_weight(self):
         """ Use total_weight if defined
         otherwise fallback on the computed weight
+
+        The weight of a package without quants is the weight of its
+        pack operations and of the packages it contains. The whole tree
+        of packages is loaded at once and its weights are computed from
+        the leaves to the roots.
         """
-        to_do = self.browse()
-        for pack in self:
-            if pack.total_weight:
-                pack.weight = pack.total_weight
-            elif not pack.quant_ids:
-                # package.pack_operations would be too easy
-                operations = self.env['stock.pack.operation'].search(
-                    [('result_package_id', '=', pack.id),
-                     ('product_id', '!=', False),
-                     ])
-
-                # we make use get_weight with  @api.muli instead of
-                # sum([op.get_weight for op in operations])
-
-                # sum of the pack_operation
-                payload_weight = operations.get_weight()
-                # sum of the packages contained in this package (children)
-                children_weight = sum(sub.weight for sub in pack.children_ids)
-
-                # sum and save in package
-                pack.weight = (
-                    payload_weight +
-                    children_weight
+        if not self.ids:
+            return
+        tree = self.search([('id', 'child_of', self.ids)])
+        self.env.cr.execute("""
+            SELECT pack.id, pack.parent_id, pack.total_weight,
+                   EXISTS (SELECT 1 FROM stock_quant quant
+                           WHERE quant.package_id = pack.id)
+            FROM stock_quant_package pack
+            WHERE pack.id IN %s
+            """, (tuple(tree.ids),))
+        children = defaultdict(list)
+        weights = {}
+        with_quants = []
+        without_quants = []
+        for pack_id, parent_id, total_weight, has_quants in \
+                self.env.cr.fetchall():
+            children[parent_id].append(pack_id)
+            if total_weight:
+                weights[pack_id] = total_weight
+            elif has_quants:
+                with_quants.append(pack_id)
+            else:
+                without_quants.append(pack_id)
+
+        if with_quants:
+            quant_packs = self.browse(with_quants)
+            super(StockQuantPackage, quant_packs)._compute_weight()
+            weights.update((pack.id, pack.weight) for pack in quant_packs)
+
+        if without_quants:
+            # package.pack_operations would be too easy
+            self.env.cr.execute("""
+                SELECT id, result_package_id
+                FROM stock_pack_operation
+                WHERE result_package_id IN %s
+                AND product_id IS NOT NULL
+                """, (tuple(without_quants),))
+            operation_packs = dict(self.env.cr.fetchall())
+            operations = self.env['stock.pack.operation'].browse(
+                operation_packs.keys())
+            operation_weights = operations._get_weight_values()
+            operations._store_weight(operation_weights)
+            payload_weights = defaultdict(float)
+            for operation_id, (weight, __) in \
+                    operation_weights.iteritems():
+                # the operations whose weight is unknown are left out
+                if weight is not None:
+                    payload_weights[operation_packs[operation_id]] += weight
+
+            # the children are listed after their parents, reversed
+            # they come before them
+            ordered = []
+            to_visit = list(self.ids)
+            while to_visit:
+                pack_id = to_visit.pop()
+                ordered.append(pack_id)
+                to_visit.extend(children[pack_id])
+            for pack_id in reversed(ordered):
+                if pack_id in weights:
+                    continue
+                weights[pack_id] = (
+                    payload_weights[pack_id] +
+                    sum(weights.get(child_id, 0.0)
+                        for child_id in children[pack_id])
                     )
 
-            else:
-                to_do |= pack
-        if to_do:
-            super(StockQuantPackage, to_do)._compute_weight()
+        for pack in self:
+            pack.weight = weights.get(pack.id, 0.0)
 
     @api.multi
     def _complete_name(self, name, args):
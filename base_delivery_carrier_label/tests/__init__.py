@@ -1 +1,3 @@
 from . import test_get_weight
+from . import test_default_options
+from . import test_sender_address
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+from openerp.tests.common import TransactionCase
+
+
+class TestDefaultOptions(TransactionCase):
+    """Test the default options of the carriers."""
+
+    def setUp(self):
+        super(TestDefaultOptions, self).setUp()
+        self.carrier = self.env['delivery.carrier'].search([], limit=1)
+        self.template_option = self.env[
+            'delivery.carrier.template.option'].create({
+                'name': 'Signature',
+                'code': 'SIGN',
+            })
+
+    def _create_option(self, vals):
+        values = {
+            'tmpl_option_id': self.template_option.id,
+            'carrier_id': self.carrier.id,
+        }
+        values.update(vals)
+        return self.env['delivery.carrier.option'].create(values)
+
+    def test_default_options_cache(self):
+        """The cache of the default options follows the options."""
+        option = self._create_option({'by_default': True})
+        self.assertIn(option, self.carrier.default_options())
+        option.by_default = False
+        self.assertNotIn(option, self.carrier.default_options())
+        option.mandatory = True
+        self.assertIn(option, self.carrier.default_options())
+        option.unlink()
+        self.assertFalse(self.carrier.default_options() & option)
+
+    def test_values_list_with_carrier_options(self):
+        """The default options are applied to all the values."""
+        option = self._create_option({'mandatory': True})
+        picking_obj = self.env['stock.picking']
+        values_list = picking_obj._values_list_with_carrier_options([
+            {'carrier_id': self.carrier.id},
+            {'carrier_id': self.carrier.id},
+            {'carrier_id': self.carrier.id, 'option_ids': [(6, 0, [])]},
+            {},
+        ])
+        for values in values_list[:2]:
+            self.assertIn(option.id, values['option_ids'][0][2])
+        self.assertEqual(values_list[2]['option_ids'], [(6, 0, [])])
+        self.assertNotIn('option_ids', values_list[3])
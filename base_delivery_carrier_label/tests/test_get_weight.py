@@ -198,7 +198,7 @@ class TestGetWeight(TransactionCase):
         products_weight = (
             weights[0] * 1000 +  # tonne
             weights[1] * 1 +  # kg
-            weights[2] * 0.01  # g
+            weights[2] * 0.001  # g
         )
         picking = self._generate_picking(products)
         operations = self.env['stock.pack.operation']
@@ -211,9 +211,74 @@ class TestGetWeight(TransactionCase):
             })
         # end of prepare data
 
-        # because uom conversion is not implemented
-        self.assertEqual(package.weight, False)
+        self.assertAlmostEqual(operations.get_weight(), products_weight)
+        self.assertAlmostEqual(package.weight, products_weight)
 
-        # if one day, uom conversion is implemented:
-        # self.assertEqual(package.get_weight(), products_weight)
-        self.assertEqual(products_weight, products_weight)  # flak8 warning
+    def test_get_weight_with_operation_uom(self):
+        """Ensure the quantities are converted in the product uom."""
+        # prepare some data
+        picking = self._generate_picking(self._get_products([1]))
+        unit = self.env.ref('product.product_uom_unit')
+        product = self._create_product({
+            'name': 'Box of screws',
+            'uom_id': unit.id,
+            'uom_po_id': unit.id,
+            'weight': 2,
+        })
+        operation = self._create_operation(picking, {
+            'product_qty': 2,
+            'product_id': product.id,
+            'product_uom_id': self.env.ref('product.product_uom_dozen').id,
+        })
+        # end of prepare data
+
+        self.assertAlmostEqual(operation.get_weight(), 2 * 12 * 2)
+        self.assertAlmostEqual(operation.weight, 2 * 12 * 2)
+
+    def test_get_weight_unconvertible_uom(self):
+        """The weight is unknown when the uom cannot be converted."""
+        # prepare some data
+        picking = self._generate_picking(self._get_products([1]))
+        unit = self.env.ref('product.product_uom_unit')
+        product = self._create_product({
+            'name': 'Bag of screws',
+            'uom_id': unit.id,
+            'uom_po_id': unit.id,
+            'weight': 2,
+        })
+        operation = self._create_operation(picking, {
+            'product_qty': 3,
+            'product_id': product.id,
+            'product_uom_id': self.env.ref('product.product_uom_kgm').id,
+        })
+        # end of prepare data
+
+        self.assertIs(operation.get_weight(), False)
+        self.assertEqual(operation.weight, 0)
+
+    def test_get_weight_nested_packages(self):
+        """Ensure the weight of the children packages is included."""
+        # prepare some data
+        weights = [2, 30, 1]
+        products = self._get_products(weights)
+        picking = self._generate_picking(products)
+        pallet = self.env['stock.quant.package'].create({})
+        boxes = self.env['stock.quant.package']
+        for product in products:
+            box = self.env['stock.quant.package'].create({
+                'parent_id': pallet.id,
+            })
+            self._create_operation(picking, {
+                'product_qty': 2,
+                'product_id': product.id,
+                'product_uom_id': product.uom_id.id,
+                'result_package_id': box.id,
+            })
+            boxes |= box
+        # end of prepare data
+
+        self.assertEqual(
+            pallet.weight,
+            sum([product.weight * 2 for product in products]))
+        for box, product in zip(boxes, products):
+            self.assertEqual(box.weight, product.weight * 2)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+from openerp.tests.common import TransactionCase
+
+
+class TestSenderAddress(TransactionCase):
+    """Test the sender address of the labels."""
+
+    def test_sender_address_follows_contacts(self):
+        """A new delivery contact of the company becomes the sender."""
+        picking = self.env['stock.picking'].search([], limit=1)
+        company_partner = picking.company_id.partner_id
+        sender = picking._get_label_sender_address()
+        self.assertEqual(
+            sender.id,
+            company_partner.address_get(adr_pref=['delivery'])['delivery'])
+        contact = self.env['res.partner'].create({
+            'name': 'Warehouse',
+            'type': 'delivery',
+            'parent_id': company_partner.id,
+        })
+        self.assertEqual(picking._get_label_sender_address(), contact)
+        self.assertEqual(
+            picking._get_label_sender_addresses(), {picking.id: contact})
+
+    def test_sender_address_archived_contact(self):
+        """An archived delivery contact is no longer the sender."""
+        picking = self.env['stock.picking'].search([], limit=1)
+        company_partner = picking.company_id.partner_id
+        sender = picking._get_label_sender_address()
+        contact = self.env['res.partner'].create({
+            'name': 'Warehouse',
+            'type': 'delivery',
+            'parent_id': company_partner.id,
+        })
+        self.assertEqual(picking._get_label_sender_address(), contact)
+        contact.active = False
+        self.assertEqual(picking._get_label_sender_address(), sender)
@@ -21,3 +21,4 @@
 
 from . import stock
 from . import wizard
+from . import report
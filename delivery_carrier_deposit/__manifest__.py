@@ -34,6 +34,7 @@
         'stock_view.xml',
         'wizard/deposit.xml',
         'ir_sequence_data.xml',
+        'deposit_data.xml',
         'report/report.xml',
         'report/deposit_slip.xml',
         'security/ir.model.access.csv',
@@ -0,0 +1,82 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#   Copyright (C) 2012-2014 Akretion France (www.akretion.com)
+#   @author: David BEAL <david.beal@akretion.com>
+#   @author: Sebastien BEAU <sebastien.beau@akretion.com>
+#   @author: Benoit GUILLOT <benoit.guillot@akretion.com>
+#   @author: Chafique DELLI <chafique.delli@akretion.com>
+#   @author: Alexis de Lattre <alexis.delattre@akretion.com>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+
+class DepositSlipEdiWriter(object):
+    """ Write the EDI file of a deposit slip for a carrier type.
+
+    The carrier modules subclass it, set the ``carrier_type`` and
+    register the class with ``register_edi_writer``.
+
+    The pickings of the slip are given to ``write_pickings`` by chunks
+    of ``chunk_size``, their fields being prefetched for the whole
+    chunk, and the file is written in a temporary file, so the EDI file
+    of a slip is never built in memory.
+    """
+
+    carrier_type = None
+    # number of pickings browsed and written at once
+    chunk_size = 1000
+    # order of the pickings in the file
+    picking_order = 'id'
+
+    def get_filename(self, deposit):
+        """ Name of the EDI file of a deposit slip """
+        return '%s.txt' % deposit.name.replace('/', '_')
+
+    def write_header(self, file_handle, deposit):
+        """ Write the beginning of the file, before the pickings """
+
+    def write_pickings(self, file_handle, deposit, pickings):
+        """ Write the lines of a chunk of pickings
+
+        :param file file_handle: opened file to write in
+        :param deposit: the deposit slip
+        :param pickings: recordset of stock.picking, a chunk of the
+                         pickings of the slip
+        """
+        raise NotImplementedError
+
+    def write_footer(self, file_handle, deposit):
+        """ Write the end of the file, after the pickings """
+
+
+_edi_writers = {}
+
+
+def register_edi_writer(writer_class):
+    """ Register the EDI writer of a carrier type, usable as
+    a class decorator """
+    _edi_writers[writer_class.carrier_type] = writer_class
+    return writer_class
+
+
+def get_edi_writer(carrier_type):
+    """ Return an instance of the EDI writer of a carrier type
+    or None when the carrier type has no EDI file """
+    writer_class = _edi_writers.get(carrier_type)
+    if writer_class is None:
+        return None
+    return writer_class()
@@ -0,0 +1,109 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#   Copyright (C) 2012-2014 Akretion France (www.akretion.com)
+#   @author: David BEAL <david.beal@akretion.com>
+#   @author: Sebastien BEAU <sebastien.beau@akretion.com>
+#   @author: Benoit GUILLOT <benoit.guillot@akretion.com>
+#   @author: Chafique DELLI <chafique.delli@akretion.com>
+#   @author: Alexis de Lattre <alexis.delattre@akretion.com>
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+#
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+from openerp import models, api
+import openerp.addons.decimal_precision as dp
+
+
+class DepositSlipReport(models.AbstractModel):
+    """ Render the deposit slips from rows read with one query per
+    slip instead of browsing every picking and its partner. """
+    _name = 'report.delivery_carrier_deposit.report_generic_deposit_slip'
+
+    # number of pickings in a table of the report
+    _lines_per_page = 40
+
+    @api.model
+    def _get_weight_formatter(self, digits):
+        """ Return a function formatting the weights with the decimal
+        and thousands separators of the language of the report, as the
+        float fields are displayed by t-field """
+        weight_format = '%%.%sf' % digits
+        lang_code = self.env.context.get('lang') or 'en_US'
+        lang = self.env['res.lang'].search([('code', '=', lang_code)],
+                                           limit=1)
+        if not lang:
+            return lambda weight: weight_format % weight
+        return lambda weight: lang.format(weight_format, weight,
+                                          grouping=True)
+
+    @api.model
+    def _get_picking_rows(self, deposit):
+        """ Return the lines of the pickings of a deposit slip,
+        as dicts with the values formatted for the report """
+        digits = dp.get_precision('Stock Weight')(self.env.cr)[1]
+        format_weight = self._get_weight_formatter(digits)
+        self.env.cr.execute("""
+            SELECT sp.name, rp.name, sp.carrier_tracking_ref,
+                   rp.zip, rc.code, sp.weight, sp.number_of_packages
+            FROM stock_picking sp
+            LEFT JOIN res_partner rp ON rp.id = sp.partner_id
+            LEFT JOIN res_country rc ON rc.id = rp.country_id
+            WHERE sp.deposit_slip_id = %s
+            ORDER BY sp.name, sp.id
+            """, (deposit.id,))
+        return [{'name': name,
+                 'partner_name': partner_name,
+                 'carrier_tracking_ref': tracking_ref or '',
+                 'zip': zip_code or '',
+                 'country_code': country_code or '',
+                 'weight': format_weight(weight or 0.0),
+                 'number_of_packages': number_of_packages or 0,
+                 }
+                for (name, partner_name, tracking_ref, zip_code,
+                     country_code, weight, number_of_packages)
+                in self.env.cr.fetchall()]
+
+    @api.model
+    def _get_pages(self, deposit):
+        """ Yield the lines of a deposit slip by pages of
+        _lines_per_page lines, each page being a table of the report.
+
+        All the lines of the slip are read at once before the first
+        page: fetching them page by page would rely on the result set
+        of the cursor of the report, which any query run while a page
+        is rendered replaces.
+        """
+        rows = self._get_picking_rows(deposit)
+        if not rows:
+            # the table of an empty slip is printed with its header
+            yield []
+            return
+        size = self._lines_per_page
+        for start in xrange(0, len(rows), size):
+            yield rows[start:start + size]
+
+    @api.multi
+    def render_html(self, data=None):
+        report_obj = self.env['report']
+        report_name = 'delivery_carrier_deposit.report_generic_deposit_slip'
+        report = report_obj._get_report_from_name(report_name)
+        docargs = {
+            'doc_ids': self._ids,
+            'doc_model': report.model,
+            'docs': self.env[report.model].browse(self._ids),
+            'get_pages': self._get_pages,
+        }
+        return report_obj.render(report_name, docargs)
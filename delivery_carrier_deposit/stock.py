@@ -23,9 +23,14 @@
 #
 ##############################################################################
 
+import base64
+import tempfile
+
 from openerp import models, fields, api
 import openerp.addons.decimal_precision as dp
 
+from .edi_writer import get_edi_writer
+
 
 class DepositSlip(models.Model):
     _name = 'deposit.slip'
@@ -39,16 +44,57 @@ class DepositSlip(models.Model):
             }
         }
 
-    @api.one
-    @api.depends('picking_ids')
+    @api.multi
+    @api.depends('picking_ids', 'picking_ids.number_of_packages',
+                 'picking_ids.weight')
     def _compute_deposit_slip(self):
-        weight = 0.0
-        number_of_packages = 0
-        for picking in self.picking_ids:
-            number_of_packages += picking.number_of_packages
-            weight += picking.weight
-        self.weight = weight
-        self.number_of_packages = number_of_packages
+        # the totals of all the slips are aggregated in one query,
+        # the new slips of the forms are not in the database yet
+        # and the slips having pickings whose totals are waiting for
+        # their recomputation would read their old values, they are
+        # summed with the ORM
+        orm_slip_ids = self._get_slips_with_pending_totals()
+        slip_ids = [slip.id for slip in self
+                    if isinstance(slip.id, (int, long)) and
+                    slip.id not in orm_slip_ids]
+        totals = {}
+        if slip_ids:
+            self.env.cr.execute("""
+                SELECT deposit_slip_id,
+                       COALESCE(SUM(number_of_packages), 0),
+                       COALESCE(SUM(weight), 0.0)
+                FROM stock_picking
+                WHERE deposit_slip_id IN %s
+                GROUP BY deposit_slip_id
+                """, (tuple(slip_ids),))
+            totals = dict((row[0], row[1:])
+                          for row in self.env.cr.fetchall())
+        for slip in self:
+            if slip.id in totals:
+                number_of_packages, weight = totals[slip.id]
+            elif slip.id in slip_ids:
+                number_of_packages, weight = 0, 0.0
+            else:
+                number_of_packages = sum(picking.number_of_packages
+                                         for picking in slip.picking_ids)
+                weight = sum(picking.weight for picking in slip.picking_ids)
+            slip.number_of_packages = number_of_packages
+            slip.weight = weight
+
+    @api.model
+    def _get_slips_with_pending_totals(self):
+        """ Return the ids of the slips having pickings whose number of
+        packages or weight is still waiting for its recomputation, so
+        the database has the old values """
+        picking_model = self.env['stock.picking']
+        pending_pickings = picking_model.browse()
+        for field_name in ('number_of_packages', 'weight'):
+            pickings = self.env.field_todo(picking_model._fields[field_name])
+            if pickings:
+                pending_pickings |= pickings
+        if not pending_pickings:
+            return set()
+        return set(pending_pickings.exists().mapped('deposit_slip_id').ids)
 
     @api.model
     def _get_carrier_type_selection(self):
@@ -74,10 +120,10 @@ class DepositSlip(models.Model):
             'deposit.slip'))
     weight = fields.Float(
         string='Total Weight', compute='_compute_deposit_slip',
-        digits=dp.get_precision('Stock Weight'), readonly=True)
+        digits=dp.get_precision('Stock Weight'), readonly=True, store=True)
     number_of_packages = fields.Integer(
         string='Number of Packages', compute='_compute_deposit_slip',
-        readonly=True)
+        readonly=True, store=True)
 
     _sql_constraints = [(
         'name_company_uniq',
@@ -93,11 +139,165 @@ class DepositSlip(models.Model):
                 'delivery.deposit')
         return super(DepositSlip, self).create(vals)
 
+    @api.model
+    def _prepare_deposit_slip(self, carrier_type, company_id):
+        return {
+            'carrier_type': carrier_type,
+            'company_id': company_id or self.env.user.company_id.id,
+            }
+
+    @api.model
+    def _get_pickings_to_deposit(self, carrier_type=None, date_cutoff=None,
+                                 company_ids=None):
+        """ Return the transferred pickings not linked to a deposit slip,
+        grouped by carrier type and company, with one query.
+
+        :param carrier_type: only this carrier type, when not set, the
+                             pickings of all the delivery methods
+                             having the option 'Deposit Slip'
+        :param date_cutoff: only the pickings transferred before
+        :param company_ids: only the pickings of these companies
+        :return: {(carrier_type, company_id): [picking ids]}, the ids
+                 being sorted by transfer date
+        """
+        # the conditions on deposit_slip_id, state and carrier_type
+        # match the partial index stock_picking_deposit_pending_index
+        query = """
+            SELECT sp.carrier_type, sp.company_id,
+                   array_agg(sp.id ORDER BY sp.date_done, sp.id)
+            FROM stock_picking sp
+            """
+        params = []
+        if not carrier_type:
+            query += " JOIN delivery_carrier dc ON dc.id = sp.carrier_id"
+        query += """
+            WHERE sp.deposit_slip_id IS NULL
+            AND sp.state = 'done'
+            AND sp.carrier_type IS NOT NULL
+            """
+        if carrier_type:
+            query += " AND sp.carrier_type = %s"
+            params.append(carrier_type)
+        else:
+            query += " AND dc.deposit_slip"
+        if date_cutoff:
+            query += " AND sp.date_done < %s"
+            params.append(date_cutoff)
+        if company_ids is not None:
+            if not company_ids:
+                return {}
+            query += " AND sp.company_id IN %s"
+            params.append(tuple(company_ids))
+        query += " GROUP BY sp.carrier_type, sp.company_id"
+        self.env.cr.execute(query, params)
+        return dict(((row[0], row[1]), row[2])
+                    for row in self.env.cr.fetchall())
+
+    @api.model
+    def create_deposit_slips(self, carrier_type=None, max_pickings=0,
+                             date_cutoff=None, company_ids=None,
+                             values=None):
+        """ Create the deposit slips of the transferred pickings, one
+        per carrier type and company, or more when a slip would
+        contain more than max_pickings pickings.
+
+        See _get_pickings_to_deposit for the other arguments.
+
+        :param int max_pickings: maximum number of pickings in a
+                                 deposit slip, 0 for no limit
+        :param dict values: values of all the slips, as returned by
+                            the hook of the wizard, the carrier type and
+                            company of the pickings have precedence
+        :return: the deposit slips created
+        """
+        groups = self._get_pickings_to_deposit(
+            carrier_type=carrier_type, date_cutoff=date_cutoff,
+            company_ids=company_ids)
+        picking_obj = self.env['stock.picking']
+        deposits = self.browse()
+        for (group_carrier_type, company_id), picking_ids in sorted(
+                groups.iteritems()):
+            size = max_pickings or len(picking_ids)
+            for start in xrange(0, len(picking_ids), size):
+                vals = dict(values or {})
+                vals.update(self._prepare_deposit_slip(group_carrier_type,
+                                                       company_id))
+                deposit = self.create(vals)
+                picking_obj.browse(picking_ids[start:start + size]).write(
+                    {'deposit_slip_id': deposit.id})
+                deposits |= deposit
+        return deposits
+
+    @api.model
+    def run_deposit_slip_creation(self):
+        """ Create the deposit slips of all the carrier types,
+        called by the scheduled action """
+        self.create_deposit_slips()
+        return True
+
     @api.multi
-    def create_edi_file(self):
+    def _get_edi_writer(self):
+        """ Return the EDI writer of the deposit slip, by default the
+        writer registered for its carrier type, see edi_writer.py.
+        Returns None when no EDI file is generated.
         """
-        Override this method for the proper carrier
+        self.ensure_one()
+        return get_edi_writer(self.carrier_type)
+
+    @api.multi
+    def _iter_picking_chunks(self, chunk_size, order='id'):
+        """ Yield the pickings of the deposit slip by chunks.
+
+        The ids are searched once, then each chunk is browsed alone so
+        the fields are prefetched for the chunk only, and the pickings
+        of the chunk are removed from the cache after it is written to
+        keep the memory usage bounded.
         """
+        self.ensure_one()
+        picking_model = self.env['stock.picking']
+        picking_ids = picking_model.search(
+            [('deposit_slip_id', '=', self.id)], order=order).ids
+        for start in xrange(0, len(picking_ids), chunk_size):
+            chunk_ids = picking_ids[start:start + chunk_size]
+            yield picking_model.browse(chunk_ids)
+            picking_model.invalidate_cache(ids=chunk_ids)
+
+    @api.multi
+    def _store_edi_file(self, file_handle, filename):
+        """ Store the EDI file written in file_handle, by default as an
+        attachment of the deposit slip. Override to send it to the
+        carrier instead.
+        """
+        self.ensure_one()
+        file_handle.seek(0)
+        return self.env['ir.attachment'].create({
+            'name': filename,
+            'datas_fname': filename,
+            'datas': base64.b64encode(file_handle.read()),
+            'res_model': self._name,
+            'res_id': self.id,
+            })
+
+    @api.multi
+    def create_edi_file(self):
+        """ Generate the EDI file of the deposit slips having an EDI
+        writer for their carrier type.
+
+        Override _get_edi_writer or register a writer for the carrier,
+        override _store_edi_file to change where the file goes.
+        """
+        for deposit in self:
+            writer = deposit._get_edi_writer()
+            if writer is None:
+                continue
+            filename = writer.get_filename(deposit)
+            with tempfile.TemporaryFile() as file_handle:
+                writer.write_header(file_handle, deposit)
+                for pickings in deposit._iter_picking_chunks(
+                        writer.chunk_size, order=writer.picking_order):
+                    writer.write_pickings(file_handle, deposit, pickings)
+                writer.write_footer(file_handle, deposit)
+                deposit._store_edi_file(file_handle, filename)
         return True
 
     @api.multi
@@ -111,6 +311,45 @@ class StockPicking(models.Model):
     _inherit = "stock.picking"
 
     deposit_slip_id = fields.Many2one('deposit.slip', 'Deposit Slip')
+    # stored to select the pickings of the deposit slips without
+    # joining the delivery methods
+    carrier_type = fields.Selection(store=True)
+
+    def _auto_init(self, cr, context=None):
+        # fill the stored carrier type of the existing pickings with one
+        # query, the ORM would compute it picking by picking
+        cr.execute("SELECT 1 FROM information_schema.columns "
+                   "WHERE table_name = 'stock_picking' "
+                   "AND column_name = 'carrier_type'")
+        if not cr.fetchone():
+            cr.execute("ALTER TABLE stock_picking "
+                       "ADD COLUMN carrier_type VARCHAR")
+            cr.execute("""
+                UPDATE stock_picking sp
+                SET carrier_type = dc.carrier_type
+                FROM delivery_carrier dc
+                WHERE dc.id = sp.carrier_id
+                """)
+        return super(StockPicking, self)._auto_init(cr, context=context)
+
+    def init(self, cr):
+        # index only the transferred pickings of a carrier which are
+        # waiting for a deposit slip, the conditions of
+        # _get_pickings_to_deposit
+        cr.execute("SELECT indexdef FROM pg_indexes WHERE indexname = %s",
+                   ('stock_picking_deposit_pending_index',))
+        row = cr.fetchone()
+        if row and 'carrier_type IS NOT NULL' not in row[0]:
+            # created by a previous version without the carrier filter
+            cr.execute("DROP INDEX stock_picking_deposit_pending_index")
+            row = None
+        if not row:
+            cr.execute("""
+                CREATE INDEX stock_picking_deposit_pending_index
+                ON stock_picking (carrier_type, company_id, date_done)
+                WHERE deposit_slip_id IS NULL AND state = 'done'
+                AND carrier_type IS NOT NULL
+                """)
 
 
 class DeliveryCarrier(models.Model):
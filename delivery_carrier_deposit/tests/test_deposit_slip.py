@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+import base64
+
+import mock
+
+from openerp.tests.common import TransactionCase
+
+from openerp.addons.delivery_carrier_deposit import edi_writer
+from openerp.addons.delivery_carrier_deposit.edi_writer import (
+    DepositSlipEdiWriter, register_edi_writer)
+
+CARRIER_TYPES = [('carrier_a', 'Carrier A'), ('carrier_b', 'Carrier B')]
+
+
+class DummyEdiWriter(DepositSlipEdiWriter):
+    """Write the names of the pickings, one line per chunk."""
+
+    carrier_type = 'carrier_a'
+    chunk_size = 2
+
+    def write_header(self, file_handle, deposit):
+        file_handle.write('HEADER %s\n' % deposit.name)
+
+    def write_pickings(self, file_handle, deposit, pickings):
+        file_handle.write('CHUNK %s\n' % ','.join(pickings.mapped('name')))
+
+    def write_footer(self, file_handle, deposit):
+        file_handle.write('FOOTER\n')
+
+
+class TestDepositSlip(TransactionCase):
+    """Test the deposit slips."""
+
+    def setUp(self):
+        super(TestDepositSlip, self).setUp()
+        carrier_class = type(self.env['delivery.carrier'])
+        patcher = mock.patch.object(
+            carrier_class, '_get_carrier_type_selection',
+            lambda self: CARRIER_TYPES)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.carrier_a = self.env.ref('delivery.delivery_carrier')
+        self.carrier_a.write({'carrier_type': 'carrier_a',
+                              'deposit_slip': True})
+        self.carrier_b = self.env.ref('delivery.free_delivery_carrier')
+        self.carrier_b.write({'carrier_type': 'carrier_b',
+                              'deposit_slip': True})
+        self.product = self.env['product.product'].create({
+            'name': 'Deposit Product',
+            'type': 'consu',
+            'weight': 2.0,
+        })
+        self.picking_type = self.env.ref('stock.picking_type_out')
+        self.location = self.env.ref('stock.stock_location_stock')
+        self.location_dest = self.env.ref('stock.stock_location_customers')
+
+    # some helpers
+    def _create_move(self, picking, quantity):
+        return self.env['stock.move'].create({
+            'name': self.product.name,
+            'product_id': self.product.id,
+            'product_uom': self.product.uom_id.id,
+            'product_uom_qty': quantity,
+            'picking_id': picking.id,
+            'location_id': self.location.id,
+            'location_dest_id': self.location_dest.id,
+        })
+
+    def _create_picking(self, carrier, quantity=1.0, packages=1):
+        picking = self.env['stock.picking'].create({
+            'picking_type_id': self.picking_type.id,
+            'location_id': self.location.id,
+            'location_dest_id': self.location_dest.id,
+            'carrier_id': carrier.id,
+            'number_of_packages': packages,
+        })
+        self._create_move(picking, quantity)
+        return picking
+
+    def _create_done_picking(self, carrier, company=None, date_done=None):
+        picking = self._create_picking(carrier)
+        if company is not None:
+            picking.company_id = company
+        picking.action_done()
+        if date_done is not None:
+            picking.date_done = date_done
+        return picking
+
+    def test_totals_follow_pickings(self):
+        """The stored totals follow the pickings attached and detached."""
+        slip = self.env['deposit.slip'].create({'carrier_type': 'carrier_a'})
+        picking_1 = self._create_picking(self.carrier_a, quantity=2.0,
+                                         packages=1)
+        picking_2 = self._create_picking(self.carrier_a, quantity=3.0,
+                                         packages=2)
+        self.assertEqual(picking_1.weight, 4.0)
+        self.assertEqual(picking_2.weight, 6.0)
+        (picking_1 | picking_2).write({'deposit_slip_id': slip.id})
+        self.assertEqual(slip.number_of_packages, 3)
+        self.assertEqual(slip.weight, 10.0)
+        # the weight of the picking is recomputed in the same
+        # transaction as the totals of the slip
+        self._create_move(picking_1, 1.0)
+        self.assertEqual(picking_1.weight, 6.0)
+        self.assertEqual(slip.weight, 12.0)
+        picking_2.deposit_slip_id = False
+        self.assertEqual(slip.number_of_packages, 1)
+        self.assertEqual(slip.weight, 6.0)
+        picking_1.deposit_slip_id = False
+        self.assertEqual(slip.number_of_packages, 0)
+        self.assertEqual(slip.weight, 0.0)
+        # the stored values, not only the cache, are up to date
+        self.env.invalidate_all()
+        self.env.cr.execute("SELECT number_of_packages, weight "
+                            "FROM deposit_slip WHERE id = %s", (slip.id,))
+        self.assertEqual(self.env.cr.fetchone(), (0, 0.0))
+
+    def test_create_deposit_slips(self):
+        """The slips are created per carrier type and company."""
+        slip_model = self.env['deposit.slip']
+        # the transferred pickings of the demo data get their own slips
+        slip_model.create_deposit_slips(carrier_type='carrier_a')
+        slip_model.create_deposit_slips(carrier_type='carrier_b')
+        company = self.env.user.company_id
+        company_2 = self.env['res.company'].create({
+            'name': 'Deposit Company',
+        })
+        pickings_a = (self._create_done_picking(self.carrier_a) |
+                      self._create_done_picking(self.carrier_a) |
+                      self._create_done_picking(self.carrier_a))
+        picking_a_2 = self._create_done_picking(self.carrier_a,
+                                                company=company_2)
+        picking_late = self._create_done_picking(
+            self.carrier_a, date_done='2100-01-01 00:00:00')
+        picking_b = self._create_done_picking(self.carrier_b)
+        self.carrier_b.deposit_slip = False
+        self.assertFalse(slip_model.create_deposit_slips(
+            company_ids=[]))
+
+        deposits = slip_model.create_deposit_slips(
+            max_pickings=2, date_cutoff='2099-01-01 00:00:00')
+        # the delivery method of carrier_b has no deposit slip option
+        self.assertEqual(set(deposits.mapped('carrier_type')),
+                         set(['carrier_a']))
+        self.assertEqual(deposits.mapped('picking_ids'),
+                         pickings_a | picking_a_2)
+        deposits_company = deposits.filtered(
+            lambda deposit: deposit.company_id == company)
+        self.assertEqual(
+            sorted(len(deposit.picking_ids) for deposit in deposits_company),
+            [1, 2])
+        deposit_company_2 = deposits - deposits_company
+        self.assertEqual(len(deposit_company_2), 1)
+        self.assertEqual(deposit_company_2.company_id, company_2)
+        self.assertEqual(deposit_company_2.picking_ids, picking_a_2)
+
+        # the option of the delivery methods is ignored when the
+        # carrier type is given
+        deposits = slip_model.create_deposit_slips(carrier_type='carrier_b')
+        self.assertEqual(len(deposits), 1)
+        self.assertEqual(deposits.carrier_type, 'carrier_b')
+        self.assertEqual(deposits.picking_ids, picking_b)
+
+        # without cutoff, the picking transferred later is deposited
+        deposits = slip_model.create_deposit_slips()
+        self.assertEqual(len(deposits), 1)
+        self.assertEqual(deposits.picking_ids, picking_late)
+        self.assertFalse(slip_model.create_deposit_slips())
+
+    def test_edi_file(self):
+        """The EDI file is written by chunks of pickings."""
+        with mock.patch.dict(edi_writer._edi_writers):
+            register_edi_writer(DummyEdiWriter)
+            slip = self.env['deposit.slip'].create({
+                'carrier_type': 'carrier_a',
+            })
+            pickings = (self._create_picking(self.carrier_a) |
+                        self._create_picking(self.carrier_a) |
+                        self._create_picking(self.carrier_a))
+            pickings.write({'deposit_slip_id': slip.id})
+            slip.validate_deposit()
+        self.assertEqual(slip.state, 'done')
+        attachment = self.env['ir.attachment'].search(
+            [('res_model', '=', 'deposit.slip'),
+             ('res_id', '=', slip.id)])
+        self.assertEqual(len(attachment), 1)
+        self.assertEqual(attachment.datas_fname,
+                         '%s.txt' % slip.name.replace('/', '_'))
+        names = pickings.sorted(key=lambda picking: picking.id).mapped('name')
+        self.assertEqual(
+            base64.b64decode(attachment.datas),
+            'HEADER %s\nCHUNK %s,%s\nCHUNK %s\nFOOTER\n' % (
+                slip.name, names[0], names[1], names[2]))
+
+    def test_no_edi_file(self):
+        """No EDI file is written without writer for the carrier type."""
+        slip = self.env['deposit.slip'].create({'carrier_type': 'carrier_b'})
+        self._create_picking(self.carrier_b).deposit_slip_id = slip
+        slip.validate_deposit()
+        self.assertFalse(self.env['ir.attachment'].search(
+            [('res_model', '=', 'deposit.slip'),
+             ('res_id', '=', slip.id)]))
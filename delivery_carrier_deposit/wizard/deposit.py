@@ -37,44 +37,66 @@ class DeliveryDepositWizard(models.TransientModel):
 
     carrier_type = fields.Selection(
         '_get_carrier_type_selection', string='Delivery Method Type',
-        required=True, help="Carrier type (combines several delivery "
+        help="Carrier type (combines several delivery "
         "methods). Make sure that the option 'Deposit Slip' is checked on "
         "the delivery methods that have this carrier type.")
+    all_carrier_types = fields.Boolean(
+        string='All Delivery Method Types',
+        help="Create the deposit slips of all the delivery methods "
+        "having the option 'Deposit Slip', one per carrier type "
+        "and company.")
+    max_pickings = fields.Integer(
+        string='Max. Delivery Orders per Slip',
+        help="When there are more delivery orders, several deposit "
+        "slips are created. 0 means no limit.")
+    date_cutoff = fields.Datetime(
+        string='Transferred Before',
+        help="Only the delivery orders transferred before this date "
+        "are added in the deposit slips.")
 
     @api.model
     def _prepare_deposit_slip(self):
-        return {
-            'carrier_type': self.carrier_type,
-            'company_id': self.env.user.company_id.id,
-            }
+        return self.env['deposit.slip']._prepare_deposit_slip(
+            self.carrier_type, self.env.user.company_id.id)
 
     @api.multi
     def create_deposit_slip(self):
         # I can't set api.one because I return an action
         self.ensure_one()
-        pickings = self.env['stock.picking'].search([
-            ('carrier_type', '=', self.carrier_type),
-            ('deposit_slip_id', '=', False),
-            ('state', '=', 'done'),
-            ])
-        if pickings:
-            vals = self._prepare_deposit_slip()
-            deposit = self.env['deposit.slip'].create(vals)
-            pickings.write({'deposit_slip_id': deposit.id})
-            action = {
-                'name': 'Deposit Slip',
-                'type': 'ir.actions.act_window',
-                'res_model': 'deposit.slip',
-                'view_type': 'form',
-                'view_mode': 'form,tree',
-                'res_id': deposit.id,
-                'nodestroy': False,
-                'target': 'current',
-            }
-            return action
-        else:
+        if not self.all_carrier_types and not self.carrier_type:
+            raise Warning(_("Select a delivery method type."))
+        companies = self.env['res.company'].search([])
+        deposits = self.env['deposit.slip'].create_deposit_slips(
+            carrier_type=(not self.all_carrier_types and
+                          self.carrier_type or None),
+            max_pickings=self.max_pickings,
+            date_cutoff=self.date_cutoff,
+            company_ids=companies.ids,
+            values=self._prepare_deposit_slip())
+        if not deposits:
+            if self.all_carrier_types:
+                raise Warning(
+                    _("There are no delivery orders in transferred "
+                      "state with a delivery method having the option "
+                      "'Deposit Slip' not already linked to a "
+                      "deposit slip."))
             raise Warning(
                 _("There are no delivery orders in transferred "
                     "state with a delivery method type '%s' "
                     "not already linked to a deposit slip.")
                 % self.carrier_type)
+        action = {
+            'name': 'Deposit Slip',
+            'type': 'ir.actions.act_window',
+            'res_model': 'deposit.slip',
+            'view_type': 'form',
+            'nodestroy': False,
+            'target': 'current',
+        }
+        if len(deposits) == 1:
+            action.update({'view_mode': 'form,tree',
+                           'res_id': deposits.id})
+        else:
+            action.update({'view_mode': 'tree,form',
+                           'domain': [('id', 'in', deposits.ids)]})
+        return action
@@ -19,13 +19,10 @@
 #
 ##############################################################################
 
-import csv
-
 from openerp.addons.base_delivery_carrier_files.generator import (
     CarrierFileGenerator
 )
 from openerp.addons.base_delivery_carrier_files.generator import BaseLine
-from openerp.addons.base_delivery_carrier_files.csv_writer import UnicodeWriter
 
 
 class LaPosteLine(BaseLine):
@@ -54,9 +51,26 @@ class LaPosteLine(BaseLine):
 
 class LaPosteFileGenerator(CarrierFileGenerator):
 
-    @classmethod
-    def carrier_for(cls, carrier_name):
-        return carrier_name == 'la_poste'
+    carrier_type = 'la_poste'
+    line_class = LaPosteLine
+    csv_delimiter = ';'
+    picking_fields = {
+        'name': None,
+        'weight': None,
+        'address_id': {'partner_id': {'name': None,
+                                      'title': None,
+                                      },
+                       'name': None,
+                       'street': None,
+                       'street2': None,
+                       'zip': None,
+                       'city': None,
+                       'country_id': {'code': None},
+                       'phone': None,
+                       'mobile': None,
+                       'email': None,
+                       },
+    }
 
     def _get_filename_single(self, picking, configuration, extension='csv'):
         return super(LaPosteFileGenerator, self
@@ -95,18 +109,3 @@ class LaPosteFileGenerator(CarrierFileGenerator):
             line.mail = address.email
         line.weight = "%.2f" % (picking.weight,)
         return [line.get_fields()]
-
-    def _write_rows(self, file_handle, rows, configuration):
-        """
-        Write the rows in the file (file_handle)
-
-        :param StringIO file_handle: file to write in
-        :param rows: rows to write in the file
-        :param browse_record configuration: configuration of the file to
-               generate
-        :return: the file_handle as StringIO with the rows written in it
-        """
-        writer = UnicodeWriter(file_handle, delimiter=';', quotechar='"',
-                               lineterminator='\n', quoting=csv.QUOTE_ALL)
-        writer.writerows(rows)
-        return file_handle
@@ -19,13 +19,10 @@
 #
 ##############################################################################
 
-import csv
-
 from openerp.addons.base_delivery_carrier_files.generator import (
     CarrierFileGenerator
 )
 from openerp.addons.base_delivery_carrier_files.generator import BaseLine
-from openerp.addons.base_delivery_carrier_files.csv_writer import UnicodeWriter
 
 
 class TNTLine(BaseLine):
@@ -51,9 +48,30 @@ class TNTLine(BaseLine):
 
 class TNTFileGenerator(CarrierFileGenerator):
 
-    @classmethod
-    def carrier_for(cls, carrier_name):
-        return carrier_name == 'tnt_express_shipper'
+    carrier_type = 'tnt_express_shipper'
+    line_class = TNTLine
+    csv_delimiter = ';'
+    picking_fields = {
+        'name': None,
+        'address_id': {'partner_id': {'name': None,
+                                      'vat': None,
+                                      },
+                       'name': None,
+                       'street': None,
+                       'street2': None,
+                       'zip': None,
+                       'state_id': {'name': None},
+                       'city': None,
+                       'country_id': {'code': None,
+                                      'name': None,
+                                      },
+                       'phone': None,
+                       'mobile': None,
+                       'fax': None,
+                       'email': None,
+                       },
+        'carrier_id': {'name': None},
+    }
 
     def _get_rows(self, picking, configuration):
         """
@@ -88,18 +106,3 @@ class TNTFileGenerator(CarrierFileGenerator):
         # according to specs, this field need at least on char
         line.notes = picking.carrier_id and picking.carrier_id.name or '*'
         return [line.get_fields()]
-
-    def _write_rows(self, file_handle, rows, configuration):
-        """
-        Write the rows in the file (file_handle)
-
-        :param StringIO file_handle: file to write in
-        :param rows: rows to write in the file
-        :param browse_record configuration: configuration of the file to
-               generate
-        :return: the file_handle as StringIO with the rows written in it
-        """
-        writer = UnicodeWriter(file_handle, delimiter=';', quotechar='"',
-                               lineterminator='\n', quoting=csv.QUOTE_ALL)
-        writer.writerows(rows)
-        return file_handle
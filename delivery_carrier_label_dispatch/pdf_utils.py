@@ -18,14 +18,93 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 ##############################################################################
+import hashlib
+import threading
+from collections import OrderedDict
 from StringIO import StringIO
 from PyPDF2 import PdfFileReader, PdfFileWriter
 
 
-def assemble_pdf(pdf_list):
+class PdfMergeCache(object):
+    """ LRU cache of merged label documents
+
+    Entries are keyed on the checksums of the merged pdf, in their
+    order of appearance. The least recently used entries are evicted
+    when ``max_entries`` or ``max_size`` (total of the cached documents
+    in bytes) is exceeded.
+
+    """
+
+    def __init__(self, max_entries=32, max_size=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                # mark as the most recently used
+                self._entries[key] = value
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_size:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = value
+            self._size += len(value)
+            while (len(self._entries) > self.max_entries or
+                    self._size > self.max_size):
+                __, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+merge_cache = PdfMergeCache()
+
+
+def pdf_checksum(pdf):
+    """ Return a checksum identifying the content of a pdf """
+    return hashlib.sha1(pdf).hexdigest()
+
+
+def assemble_pdf(pdf_list, checksums=None):
     """
     Assemble a list of pdf
+
+    When ``checksums`` is given (one checksum per pdf of ``pdf_list``),
+    the merged document is kept in ``merge_cache`` and returned as is
+    when the same pdf are assembled again. In that case ``pdf_list``
+    is not consumed at all, so it can be a generator reading the pdf
+    lazily.
     """
+    if checksums is not None:
+        key = tuple(checksums)
+        merged = merge_cache.get(key)
+        if merged is None:
+            merged = _assemble_pdf(pdf_list)
+            merge_cache.set(key, merged)
+        return merged
+    return _assemble_pdf(pdf_list)
+
+
+def _assemble_pdf(pdf_list):
     # Even though we are using PyPDF2 we can't use PdfFileMerger
     # as this issue still exists in mostly used wkhtmltohpdf reports version
     # http://code.google.com/p/wkhtmltopdf/issues/detail?id=635
@@ -46,18 +46,37 @@ class PickingDispatch(Model):
 
         This will replace all carrier options in picking
 
+        The pickings are grouped by carrier and options so a single
+        write is done for all the pickings sharing the same values,
+        whatever the dispatch they belong to. As the options are
+        always given, the default options of the carrier are not
+        computed again by the write.
+
         """
         picking_obj = self.pool.get('stock.picking')
+        picking_values = {}
         for dispatch in self.browse(cr, uid, ids, context=context):
-            picking_ids = [p.id for p in dispatch.related_picking_ids]
-
-            option_ids = [o.id for o in dispatch.option_ids]
+            option_ids = tuple(sorted(o.id for o in dispatch.option_ids))
+            values_key = (dispatch.carrier_id.id, option_ids)
+            # when a picking is in several dispatches, the last
+            # dispatch wins as it used to be when writing one
+            # dispatch after the other
+            for picking in dispatch.related_picking_ids:
+                picking_values[picking.id] = values_key
+
+        picking_groups = {}
+        for picking_id, values_key in picking_values.iteritems():
+            picking_groups.setdefault(values_key, []).append(picking_id)
+
+        for values_key, picking_ids in picking_groups.iteritems():
+            carrier_id, option_ids = values_key
             options_datas = {
-                'carrier_id': dispatch.carrier_id.id,
-                'option_ids': [(6, 0, option_ids)],
+                'carrier_id': carrier_id,
+                'option_ids': [(6, 0, list(option_ids))],
             }
             picking_obj.write(cr, uid, picking_ids,
                               options_datas, context=context)
+        return True
 
     def carrier_id_change(self, cr, uid, ids, carrier_id, context=None):
         """ Inherit this method in your module """
@@ -20,6 +20,9 @@
 ##############################################################################
 import openerp.tests.common as common
 from openerp.addons import get_module_resource
+from openerp.addons.delivery_carrier_label_dispatch.pdf_utils import (
+    merge_cache
+)
 
 
 class test_generate_labels(common.TransactionCase):
@@ -122,3 +125,27 @@ class test_generate_labels(common.TransactionCase):
         wizard = self.DeliveryCarrierLabelGenerate.browse(
             cr, uid, wizard_id, context=None)
         assert wizard.label_pdf_file
+
+    def test_01_action_generate_labels_cached(self):
+        """ Check a reprint of the same labels reuses the merged pdf """
+        cr, uid = self.cr, self.uid
+        merge_cache.clear()
+        active_ids = [self.picking_dispatch_id]
+        context = {'active_ids': active_ids,
+                   'active_model': 'picking.dispatch'}
+        wizard_id = self.DeliveryCarrierLabelGenerate.create(
+            cr, uid, {}, context=context)
+        self.DeliveryCarrierLabelGenerate.action_generate_labels(
+            cr, uid, [wizard_id], context=context)
+        self.assertEqual(len(merge_cache), 1)
+        self.DeliveryCarrierLabelGenerate.action_generate_labels(
+            cr, uid, [wizard_id], context=context)
+        self.assertEqual(len(merge_cache), 1)
+        Attachment = self.registry('ir.attachment')
+        attachment_ids = Attachment.search(
+            cr, uid,
+            [('res_model', '=', 'picking.dispatch'),
+             ('res_id', '=', self.picking_dispatch_id)])
+        attachments = Attachment.browse(cr, uid, attachment_ids)
+        self.assertEqual(len(attachments), 2)
+        self.assertEqual(attachments[0].datas, attachments[1].datas)
@@ -24,7 +24,7 @@ from itertools import groupby
 from openerp.osv import orm, fields
 from openerp.tools.translate import _
 
-from ..pdf_utils import assemble_pdf
+from ..pdf_utils import assemble_pdf, pdf_checksum
 
 
 class DeliveryCarrierLabelGenerate(orm.TransientModel):
@@ -117,6 +117,18 @@ class DeliveryCarrierLabelGenerate(orm.TransientModel):
                     continue  # no label could be generated
             yield label
 
+    def _get_label_checksum(self, cr, uid, label, context=None):
+        """ Return a checksum identifying the content of a label
+
+        The filestore names of the attachments are built from the
+        sha1 of their content, so they are used when available to
+        avoid reading the data of the label.
+
+        """
+        if label.store_fname:
+            return label.store_fname
+        return pdf_checksum(label.datas)
+
     def action_generate_labels(self, cr, uid, ids, context=None):
         """
         Call the creation of the delivery carrier label
@@ -131,15 +143,21 @@ class DeliveryCarrierLabelGenerate(orm.TransientModel):
         attachment_obj = self.pool.get('ir.attachment')
 
         for dispatch in this.dispatch_ids:
-            labels = self._get_all_pdf(cr, uid, this, dispatch,
-                                       context=context)
-            labels = (label.datas for label in labels)
-            labels = (label.decode('base64') for label in labels if labels)
+            labels = list(self._get_all_pdf(cr, uid, this, dispatch,
+                                            context=context))
+            checksums = [self._get_label_checksum(cr, uid, label,
+                                                  context=context)
+                         for label in labels]
+            # the pdf are only read when the merged document
+            # is not already in the cache
+            pdf_list = (label.datas.decode('base64') for label in labels
+                        if label.datas)
             data = {
                 'name': dispatch.name + '.pdf',
                 'res_id': dispatch.id,
                 'res_model': 'picking.dispatch',
-                'datas': assemble_pdf(labels).encode('base64'),
+                'datas': assemble_pdf(pdf_list,
+                                      checksums=checksums).encode('base64'),
             }
             attachment_obj.create(cr, uid, data, context=context)
 
@@ -45,8 +45,12 @@ class StockPicking(models.Model):
 
     @api.multi
     def _generate_postlogistics_label(self, webservice_class=None,
-                                      package_ids=None):
-        """ Generate labels and write tracking numbers received """
+                                      package_ids=None, packages=None):
+        """ Generate labels and write tracking numbers received
+
+        :param packages: all the packages of the picking when they are
+                         already known, read from the picking otherwise
+        """
         self.ensure_one()
         user = self.env.user
         company = user.company_id
@@ -54,7 +58,8 @@ class StockPicking(models.Model):
             webservice_class = PostlogisticsWebService
 
         if package_ids is None:
-            packages = self._get_packages_from_picking()
+            if packages is None:
+                packages = self._get_packages_from_picking()
             packages = sorted(packages, key=attrgetter('name'))
         else:
             # restrict on the provided packages
@@ -101,6 +106,15 @@ class StockPicking(models.Model):
 
         return labels
 
+    @api.multi
+    def _generate_picking_shipping_labels(self, packages):
+        """ Use the packages found for all the pickings """
+        self.ensure_one()
+        if self.carrier_id.carrier_type == 'postlogistics':
+            return self._generate_postlogistics_label(packages=packages)
+        _super = super(StockPicking, self)
+        return _super._generate_picking_shipping_labels(packages)
+
     @api.multi
     def generate_shipping_labels(self, package_ids=None):
         """ Add label generation for Postlogistics """